@@ -0,0 +1,318 @@
+"""Benchmarks for the ETL and dashboard hot paths at synthetic scale.
+
+For every scale factor a seeded synthetic extract is written with
+``synthetic_data`` (and reused on later runs), then each stage is timed on
+its own, outside Streamlit:
+
+- ``etl.*``      staging ETL, single-pass fact build and CSV write
+- ``load.*``     fact CSV parse into the compact schema, and a warm columnar cache read
+- ``prepare.*``  filter index, rollup cube and map pyramid builds (or the SQL local copy)
+- ``filters``    the sidebar filter path: options, label lookups, normalise, row count
+- ``tab.*``      each chart / KPI computation of every tab, unfiltered and filtered
+
+Times are the median of ``--repeat`` runs. Peak memory is measured in one
+extra run under ``tracemalloc`` (Python and NumPy allocations); the staging
+ETL runs in worker processes, so its figure is the workers' peak RSS
+instead. Results are written as JSON, and ``--compare`` prints the ratio
+against an earlier results file.
+
+Usage::
+
+    python benchmark_suite.py --scales 100k,2.2M,20M --engines pandas,sqlite --out bench_results.json
+    python benchmark_suite.py --scales 100k --compare bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import crime_etl
+import synthetic_data
+from chart_sampling import SCATTER_POINT_LIMIT
+from columnar_cache import read_cached_csv
+from fact_builder import FACT_COLUMNS, build_warehouse, write_tables
+from fact_schema import apply_schema, csv_dtypes
+from filter_index import FilterIndex
+from query_backend import PandasBackend, SQLBackend, available_engines, build_local_copy
+from rollup_cube import RollupCube
+from spatial_bins import MAP_MARKER_BUDGET, SpatialPyramid
+from star_schema import Dimensions
+
+# ------------------ SETTINGS ------------------ #
+DEFAULT_SCALES = "100k"
+DEFAULT_REPEAT = 3
+WORK_DIR = ".bench_data"
+
+# Mirrors the compute functions of each ccc_app tab: name -> fn(backend, selection).
+TAB_WORKLOADS = {
+    "fact_crime_count": {
+        "kpis": lambda b, s: (
+            b.total("number_of_crime", selection=s),
+            b.nunique("lsoa_id", s),
+            b.nunique("location_id", s),
+            b.nunique("crime_type_id", s),
+        ),
+        "timeseries": lambda b, s: b.query(["year_month"], {"number_of_crime": "sum"}, s),
+        "top_types": lambda b, s: b.query(["crime_type"], {"number_of_crime": "sum"}, s),
+        "lsoa": lambda b, s: b.query(["lsoa_name"], {"number_of_crime": "sum"}, s),
+        "map": lambda b, s: b.map_markers(s, MAP_MARKER_BUDGET)[0],
+    },
+    "fact_crime_num": {
+        "kpis": lambda b, s: b.query([], {
+            "number_of_crime": "sum",
+            "police_officer_strength": "mean",
+            "police_staff_strength": "mean",
+            "pcso_strength": "mean",
+        }, s),
+        "timeseries": lambda b, s: b.query(
+            ["year_month"], {"number_of_crime": "sum", "police_officer_strength": "mean"}, s
+        ),
+        "scatter_sample": lambda b, s: b.sample_rows(s, "crime_type_id", SCATTER_POINT_LIMIT),
+        "scatter_density": lambda b, s: b.density(s, "police_officer_strength", "number_of_crime")[0],
+        "lsoa_strength": lambda b, s: b.query(
+            ["lsoa_name"], {"number_of_crime": "sum", "police_officer_strength": "mean"}, s
+        ),
+    },
+    "fact_occuring_time": {
+        "kpis": lambda b, s: (
+            b.total("number_of_crime_occuring", selection=s),
+            b.nunique("lsoa_id", s),
+            b.nunique("location_id", s),
+            b.nunique("crime_type_id", s),
+        ),
+        "timeseries": lambda b, s: b.query(["year_month"], {"number_of_crime_occuring": "sum"}, s),
+        "crime_types": lambda b, s: b.query(["crime_type"], {"number_of_crime_occuring": "sum"}, s),
+    },
+    "fact_resolution": {
+        "kpis": lambda b, s: (
+            b.total("number_of_resolution", selection=s),
+            b.nunique("outcome_id", s),
+            b.nunique("crime_type_id", s),
+            b.nunique("lsoa_id", s),
+        ),
+        "timeseries": lambda b, s: b.query(["year_month"], {"number_of_resolution": "sum"}, s),
+        "outcomes": lambda b, s: b.query(["last_outcome_category"], {"number_of_resolution": "sum"}, s),
+        "tree": lambda b, s: b.query(["crime_type", "last_outcome_category"], {"number_of_resolution": "sum"}, s),
+    },
+}
+
+
+# ------------------ MEASURE ------------------ #
+def _rows(result):
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray, list)):
+        return len(result)
+    return None
+
+
+def measure(fn, repeat=DEFAULT_REPEAT, memory=True):
+    """(last result, {seconds, min_seconds, runs, peak_mb}) for ``fn()``."""
+    runs, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return result, {
+        "seconds": round(statistics.median(runs), 6),
+        "min_seconds": round(min(runs), 6),
+        "runs": [round(r, 6) for r in runs],
+        "peak_mb": None if peak is None else round(peak, 2),
+    }
+
+
+def parse_fact_csv(path, table):
+    # Same parse as ccc_app.parse_fact_csv (the app module runs on import).
+    return apply_schema(pd.read_csv(path, dtype=csv_dtypes(table)), table)
+
+
+def sidebar_filters(backend):
+    """The compute path behind ``add_basic_filters`` with every filter left at its default."""
+    selection = {}
+    for col in ("year", "month_number"):
+        selection[col] = backend.options(col)
+    for key in ("lsoa_id", "crime_type_id"):
+        keys = backend.options(key)
+        if keys and key in backend.dims:
+            sorted({v for v in backend.dims.labels(key, keys) if v is not None})
+    active = backend.normalise(selection)
+    return backend.count(active)
+
+
+def filtered_selection(backend):
+    """Latest year and the two lowest crime type ids – a typical narrowed view."""
+    years = backend.options("year")
+    types = backend.options("crime_type_id")
+    return backend.normalise({"year": years[-1:], "crime_type_id": types[:2]})
+
+
+# ------------------ SUITE ------------------ #
+class Suite:
+    """Collects one result record per (scale, stage, table, engine, selection)."""
+
+    def __init__(self, repeat=DEFAULT_REPEAT, log=print):
+        self.repeat = repeat
+        self.log = log
+        self.results = []
+
+    def run(self, scale, stage, fn, table=None, engine=None, selection=None, rows_in=None,
+            repeat=None, memory=True):
+        result, stats = measure(fn, self.repeat if repeat is None else repeat, memory)
+        record = {
+            "scale": scale,
+            "stage": stage,
+            "table": table,
+            "engine": engine,
+            "selection": selection,
+            "rows_in": rows_in,
+            "rows_out": _rows(result),
+            **stats,
+        }
+        self.results.append(record)
+        where = "/".join(str(p) for p in (table, engine, selection) if p)
+        self.log(f"[{scale}] {stage:<28} {where:<40} {stats['seconds'] * 1000:10.1f} ms"
+                 + ("" if stats["peak_mb"] is None else f" {stats['peak_mb']:9.1f} MB"))
+        return result
+
+
+def run_scale(suite, label, n_rows, work_dir, seed, engines, workers=None):
+    base = os.path.join(work_dir, f"{label}-seed{seed}")
+    started = time.perf_counter()
+    data = synthetic_data.write_dataset(os.path.join(base, "raw"), n_rows, seed, log=lambda _: None)
+    suite.log(f"[{label}] synthetic data ready in {time.perf_counter() - started:.1f}s "
+              f"({data['lsoas']:,} LSOAs, {data['locations']:,} locations)")
+
+    # ETL: staging (worker processes), single-pass build, CSV write.
+    staging = os.path.join(base, "staging")
+    warehouse = os.path.join(base, "warehouse")
+    # Staging writes one part per month file; parts from an earlier dataset would be read too.
+    shutil.rmtree(staging, ignore_errors=True)
+    suite.run(label, "etl.staging",
+              lambda: crime_etl.run(data["crime_dir"], data["police_csv"], staging, workers, log=lambda _: None),
+              rows_in=n_rows, repeat=1, memory=False)
+    # ru_maxrss is in KiB on Linux.
+    suite.results[-1]["peak_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 2)
+    suite.results[-1]["memory"] = "worker peak RSS"
+    dims, facts = suite.run(label, "etl.fact_build", lambda: build_warehouse(staging), rows_in=n_rows, repeat=1)
+    suite.run(label, "etl.write_tables", lambda: write_tables({**dims, **facts}, warehouse), repeat=1, memory=False)
+    del dims, facts
+
+    cache_dir = os.path.join(base, "cache")
+    for table in FACT_COLUMNS:
+        path = os.path.join(warehouse, f"{table}.csv")
+        df = suite.run(label, "load.parse", lambda: parse_fact_csv(path, table), table=table)
+        read_cached_csv(path, parse=lambda p: parse_fact_csv(p, table), cache_dir=cache_dir)
+        df = suite.run(label, "load.columnar_cache",
+                       lambda: read_cached_csv(path, parse=None, cache_dir=cache_dir), table=table, rows_in=len(df))
+
+        for engine in engines:
+            if engine == "pandas":
+                suite.run(label, "prepare.filter_index", lambda: FilterIndex(df), table, engine, rows_in=len(df))
+                labels = Dimensions.from_fact(df).cube_labels(df)
+                suite.run(label, "prepare.rollup_cube", lambda: RollupCube(df, labels=labels), table, engine,
+                          rows_in=len(df))
+                if table == "fact_crime_count":
+                    suite.run(label, "prepare.spatial_pyramid", lambda: SpatialPyramid(df), table, engine,
+                              rows_in=len(df))
+                backend = PandasBackend(df)
+            else:
+                target = os.path.join(cache_dir, f"bench-{table}.{engine}")
+                suite.run(label, "prepare.local_copy", lambda: build_local_copy(path, engine, target, "bench"),
+                          table, engine, rows_in=len(df), repeat=1)
+                backend = SQLBackend(path, engine, cache_dir=cache_dir)
+            sidebar_filters(backend)  # warm the structures the tabs share
+            suite.run(label, "filters", lambda: sidebar_filters(backend), table, engine, rows_in=len(df))
+
+            selections = {"all": {}, "filtered": filtered_selection(backend)}
+            for sel_name, selection in selections.items():
+                for name, fn in TAB_WORKLOADS[table].items():
+                    suite.run(label, f"tab.{name}", lambda: fn(backend, selection), table, engine, sel_name,
+                              rows_in=len(df))
+
+
+# ------------------ REPORT ------------------ #
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "engines": available_engines(),
+    }
+
+
+def _record_key(r):
+    return (r["scale"], r["stage"], r["table"], r["engine"], r["selection"])
+
+
+def compare(baseline, current, log=print):
+    """Print current / baseline time for every stage present in both runs."""
+    before = {_record_key(r): r for r in baseline["results"]}
+    for r in current["results"]:
+        old = before.get(_record_key(r))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        flag = "  slower" if ratio > 1.2 else "  faster" if ratio < 0.8 else ""
+        where = "/".join(str(p) for p in (r["table"], r["engine"], r["selection"]) if p)
+        log(f"[{r['scale']}] {r['stage']:<28} {where:<40} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the ETL and dashboard hot paths on synthetic data.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="Comma-separated crime row counts, e.g. 100k,2.2M,20M")
+    parser.add_argument("--engines", default="pandas", help="Comma-separated query engines (pandas, duckdb, sqlite)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per stage (median reported)")
+    parser.add_argument("--seed", type=int, default=synthetic_data.DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=None, help="Staging ETL process pool size")
+    parser.add_argument("--work-dir", default=WORK_DIR, help="Synthetic data and intermediate outputs")
+    parser.add_argument("--out", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = set(engines) - set(available_engines())
+    if unknown:
+        parser.error(f"Unavailable engine(s): {', '.join(sorted(unknown))}")
+
+    suite = Suite(args.repeat)
+    report = {"environment": environment(), "seed": args.seed, "repeat": args.repeat, "results": suite.results}
+    for label in [s.strip() for s in args.scales.split(",") if s.strip()]:
+        run_scale(suite, label, synthetic_data.parse_scale(label), args.work_dir, args.seed, engines, args.workers)
+
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"{len(suite.results)} results -> {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            compare(json.load(fh), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,28 @@
+from functools import partial
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+import perf_trace
+from chart_sampling import SCATTER_POINT_LIMIT
+from columnar_cache import fingerprint_digest, read_cached_csv
+from data_export import EXPORT_FORMATS, EXPORT_ROW_LIMIT, export_file
+from data_quality import REPORT_NAME, read_report, report_tables
+from fact_schema import apply_schema, csv_dtypes, validate_source
+from fact_store import FactStore, source_signature
+from incremental_load import refreshed_months
+from query_backend import PandasBackend, SQLBackend, available_engines, local_copy_current, prepare_local_copy
+from result_cache import ResultCache, filter_key, result_key, touches_months
+from source_loader import load_sources
+from spatial_bins import MAP_MARKER_BUDGET
+from star_schema import DIMENSION_TABLES, Dimensions
+from upload_ingest import ingest_upload, read_upload
+
+# Shared frames rely on Copy-on-Write (the default from pandas 3).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # ------------------ PAGE CONFIG ------------------ #
 st.set_page_config(
     page_title="Crime Data Warehouse – Business Insight Dashboards",
@@ -14,87 +35,354 @@ DEFAULT_CC_PATH = "fact_crime_count.csv"
 DEFAULT_CN_PATH = "fact_crime_num.csv"
 DEFAULT_OT_PATH = "fact_occuring_time.csv"
 DEFAULT_RES_PATH = "fact_resolution.csv"
+# Written next to the facts by fact_builder.py / data_quality.py.
+DEFAULT_QUALITY_PATH = REPORT_NAME
+
+# Aggregate export per fact: (group-by columns, measures) at the grain the charts roll up from.
+_EXPORT_GRAIN = ["year_month", "lsoa_name", "crime_type"]
+EXPORT_AGGREGATES = {
+    "fact_crime_count": (_EXPORT_GRAIN, {"number_of_crime": "sum"}),
+    "fact_crime_num": (
+        _EXPORT_GRAIN,
+        {
+            "number_of_crime": "sum",
+            "police_officer_strength": "mean",
+            "police_staff_strength": "mean",
+            "pcso_strength": "mean",
+        },
+    ),
+    "fact_occuring_time": (_EXPORT_GRAIN, {"number_of_crime_occuring": "sum"}),
+    "fact_resolution": (_EXPORT_GRAIN + ["last_outcome_category"], {"number_of_resolution": "sum"}),
+}
+
+# Label tables for key-only (star-schema) facts; only read when such a fact is loaded.
+DEFAULT_DIM_PATHS = {name: f"{name}.csv" for name, _ in DIMENSION_TABLES.values()}
 
 
 # ------------------ HELPERS ------------------ #
-@st.cache_data
-def load_csv(path_or_file):
-    df = pd.read_csv(path_or_file)
-    # Standardise year/month & year_month
-    if {"year", "month_number"}.issubset(df.columns):
-        df["year"] = df["year"].astype(int)
-        df["month_number"] = df["month_number"].astype(int)
-        df["year_month"] = (
-            df["year"].astype(str)
-            + "-"
-            + df["month_number"].astype(str).str.zfill(2)
-        )
-    else:
-        df["year_month"] = "Unknown"
-    return df
+def parse_fact_csv(path_or_file, table):
+    """Parse a fact CSV straight into the compact schema for ``table``."""
+    df = pd.read_csv(path_or_file, dtype=csv_dtypes(table))
+    return apply_schema(df, table)
 
 
-def sidebar_file_uploader(label, default_path, key):
-    """Upload or fall back to default CSV."""
-    file = st.sidebar.file_uploader(label, type=["csv"], key=key)
-    if file is not None:
-        st.sidebar.success("Using uploaded file ✅")
-        return load_csv(file)
-    else:
+def load_fact_file(path, table):
+    """Columnar-cached load of a fact CSV on disk."""
+    return read_cached_csv(path, parse=partial(parse_fact_csv, table=table))
+
+
+@st.cache_resource(max_entries=8)
+def get_upload_frame(digest, table):
+    """Ingested upload, memory-mapped once per process and shared by every session holding it."""
+    return read_upload(digest, table)
+
+
+def ingest_uploaded_file(file, table):
+    """Content hash of an upload, streamed to its columnar file the first time this session sees it."""
+    # Later reruns refer to the file by hash: no re-hashing, no re-parsing.
+    state_key = f"upload:{table}"
+    known = st.session_state.get(state_key)
+    if known is not None and known[0] == file.file_id:
+        return known[1]
+    validate_source(file, table)
+    with st.spinner(f"Ingesting `{file.name}`…"):
+        digest = ingest_upload(file, table)
+    st.session_state[state_key] = (file.file_id, digest)
+    return digest
+
+
+@st.cache_data(max_entries=4)
+def load_quality_report(path, signature):
+    """Parsed quality report, re-read only when the file changes."""
+    return read_report(path)
+
+
+def get_quality_report(path=DEFAULT_QUALITY_PATH):
+    """The warehouse build's quality report, or None when there is none."""
+    try:
+        signature = source_signature(path)
+    except OSError:
+        return None
+    return load_quality_report(path, signature)
+
+
+@st.cache_resource(max_entries=4)
+def build_star_dimensions(fingerprints, _tables):
+    """Label lookups from the shared dim_* tables."""
+    return Dimensions.from_tables(_tables)
+
+
+def get_star_dimensions():
+    """Key -> label lookups for key-only (star-schema) facts."""
+    tables = {}
+    for name, path in DEFAULT_DIM_PATHS.items():
         try:
-            st.sidebar.info(f"Using default file: `{default_path}`")
-            return load_csv(default_path)
-        except Exception as e:
-            st.sidebar.error(f"Could not load `{default_path}`. Upload a CSV instead.\n\n{e}")
-            return None
+            tables[name] = get_fact_store().get(path, name)
+        except FileNotFoundError:
+            continue
+    fingerprints = tuple(sorted((n, t.attrs["fingerprint"]) for n, t in tables.items()))
+    return build_star_dimensions(fingerprints, tables)
+
+
+@st.cache_resource(max_entries=16)
+def get_pandas_backend(fingerprint, _df):
+    """In-memory backend (filter index, rollup cube, map pyramid) per dataset, shared by every session."""
+    # Keyed on the fact alone: surrogate ids are stable, so a dim reload only adds labels.
+    return PandasBackend(_df, star_dimensions=get_star_dimensions)
+
+
+@st.cache_resource(max_entries=16)
+def get_sql_backend(engine, path, signature):
+    """Embedded-SQL backend over a local copy of ``path``; rebuilt when the file changes."""
+    return SQLBackend(path, engine, star_dimensions=get_star_dimensions)
 
 
-def add_basic_filters(df, prefix=""):
-    """Return filtered df & show filters in sidebar for year, month, lsoa, crime type."""
-    if df is None or df.empty:
-        return df
+@st.cache_resource
+def get_result_cache():
+    """LRU of computed KPIs / figures shared by every session."""
+    return ResultCache()
+
+
+def cached_result(backend, selection, chart_id, compute):
+    """Serve ``compute()`` from the result cache for this dataset, filter set and chart."""
+    key = result_key(backend.fingerprint, selection, chart_id)
+    with perf_trace.stage(f"compute.{chart_id}", rows_in=backend.n_rows, filters=key[1]) as info:
+        computed = []
+        value = get_result_cache().get_or_compute(key, lambda: computed.append(True) or compute())
+        info["cached"] = not computed
+        info["rows_out"] = perf_trace.row_count(value)
+    return value
+
+
+def show_chart(fig, key):
+    """Render a plotly figure (timed as ``render.<key>``: serialisation + send)."""
+    with perf_trace.stage(f"render.{key}"):
+        st.plotly_chart(fig, use_container_width=True, key=key)
+
+
+def on_fact_reload(path, stale, fresh):
+    """Drop cached results for a reloaded table, keeping those of untouched months.
+
+    When the incremental loader's manifest explains the change, results whose
+    filters exclude every refreshed month stay valid and move to the new
+    fingerprint; otherwise everything computed for the old version is dropped.
+    """
+    months = refreshed_months(path, fingerprint_digest(stale), fingerprint_digest(fresh))
+    if months is None:
+        get_result_cache().invalidate(stale)
+    else:
+        get_result_cache().carry_over(stale, fresh, keep=lambda filters: not touches_months(filters, months))
+
+
+@st.cache_resource
+def get_fact_store():
+    """Default fact tables shared zero-copy by every session."""
+    return FactStore(load_fact_file, on_reload=on_fact_reload)
+
+
+def default_source_current(path, engine):
+    """True when the default file is already loaded (or copied) for ``engine``."""
+    if engine == "pandas":
+        return get_fact_store().is_current(path)
+    return local_copy_current(path, engine)
+
+
+def load_default_sources(sources, engine="pandas"):
+    """Validate and load the default files ([(path, table)]) that are not loaded yet, concurrently.
+
+    Shows a progress bar while files load; returns {path: error} for the ones that failed.
+    """
+    pending = [(path, table) for path, table in sources if not default_source_current(path, engine)]
+    if not pending:
+        return {}
+    store = get_fact_store()
+
+    def load(path, table):
+        # Runs on a loader thread: no st.* calls and no st.cache_* lookups here.
+        if engine == "pandas":
+            store.get(path, table)
+        else:
+            prepare_local_copy(path, engine)
+
+    progress = st.progress(0.0, text=f"Loading {len(pending)} data file(s)…")
+
+    def report(done, total, path, error):
+        progress.progress(done / total, text=f"`{path}` {'failed' if error else 'loaded'} ({done}/{total})")
+
+    with perf_trace.stage("load.sources", engine=engine, files=len(pending)) as info:
+        loaded, errors = load_sources(pending, load, on_progress=report)
+        info["slowest_file"] = max(loaded, key=loaded.get) if loaded else None
+        info["failed"] = len(errors)
+    progress.empty()
+    return errors
+
+
+def sidebar_file_uploader(label, key):
+    """Upload widget plus an empty slot for its source message."""
+    return st.sidebar.file_uploader(label, type=["csv"], key=key), st.sidebar.empty()
+
+
+def source_backend(file, status, default_path, table, engine="pandas", error=None):
+    """Query backend for the uploaded or default CSV (``error``: why the default failed to load)."""
+    with perf_trace.stage(f"load.{table}", engine=engine) as info:
+        backend = None
+        if file is not None:
+            try:
+                df = get_upload_frame(ingest_uploaded_file(file, table), table)
+                backend = get_pandas_backend(df.attrs["fingerprint"], df)
+                status.success("Using uploaded file ✅")
+            except ValueError as e:  # SchemaMismatch, or a bad row past the validated sample
+                status.error(f"Upload rejected. {e}")
+        elif error is not None:
+            status.error(f"Could not load `{default_path}`. Upload a CSV instead.\n\n{error}")
+        else:
+            try:
+                if engine != "pandas":
+                    backend = get_sql_backend(engine, default_path, source_signature(default_path))
+                else:
+                    df = get_fact_store().get(default_path, table)
+                    backend = get_pandas_backend(df.attrs["fingerprint"], df)
+                status.info(f"Using default file: `{default_path}`")
+            except Exception as e:
+                status.error(f"Could not load `{default_path}`. Upload a CSV instead.\n\n{e}")
+        info["rows_out"] = None if backend is None else backend.n_rows
+    return backend
+
+
+FILTER_STATE_PREFIX = "filter:"
+
+
+def keep_filter_state():
+    """Keep the sidebar filters of hidden views across reruns.
+
+    Streamlit drops a widget's state on any run that does not draw it; writing
+    the value back turns it into session state that outlives the widget.
+    """
+    for key in [k for k in st.session_state if str(k).startswith(FILTER_STATE_PREFIX)]:
+        st.session_state[key] = st.session_state[key]
+
+
+def filter_multiselect(prefix, col, label, options, default):
+    key = f"{FILTER_STATE_PREFIX}{prefix}{col}"
+    shown_key = f"filter_options:{prefix}{col}"
+    shown, st.session_state[shown_key] = st.session_state.get(shown_key), options
+    if key in st.session_state:
+        remembered = st.session_state[key]
+        if default and shown is not None and shown != options and set(remembered) >= set(shown):
+            # Everything was selected: follow the options as they narrow or widen, like the default.
+            st.session_state[key] = list(default)
+        else:
+            # A remembered selection replaces the default; drop values the data no longer has.
+            st.session_state[key] = [v for v in remembered if v in options]
+        return st.sidebar.multiselect(f"{prefix}{label}", options, key=key)
+    return st.sidebar.multiselect(f"{prefix}{label}", options, default=default, key=key)
+
+
+def add_basic_filters(backend, prefix=""):
+    """Return the active selection; filters shown in sidebar for year, month, lsoa, crime type."""
+    if backend is None or backend.n_rows == 0:
+        return {}
 
     st.sidebar.markdown(f"**Filters – {prefix}**")
 
-    df_f = df.copy()
+    with perf_trace.stage(f"filters.{prefix.strip()}", rows_in=backend.n_rows) as info:
+        selection = _basic_filters(backend, prefix)
+        info["filters"] = filter_key(selection)
+        if perf_trace.active() is not None:
+            info["rows_out"] = matching_rows(backend, selection)
+    return selection
+
+
+def filter_options(backend, col, selection):
+    """Values of ``col`` left by the filters above it (shared through the result cache)."""
+    selection = backend.normalise(selection)
+    if not selection:
+        return backend.options(col)
+    return cached_result(backend, selection, f"options.{col}", lambda: backend.options(col, selection))
 
+
+def _basic_filters(backend, prefix):
+    dims = backend.dims
+    selection = {}
+
+    # Each filter offers only the values left by the filters above it.
     # Year filter
-    if "year" in df_f.columns:
-        years = sorted(df_f["year"].dropna().unique().tolist())
-        selected_years = st.sidebar.multiselect(
-            f"{prefix}Year", years, default=years
-        )
-        if selected_years:
-            df_f = df_f[df_f["year"].isin(selected_years)]
+    years = filter_options(backend, "year", selection)
+    if years:
+        selection["year"] = filter_multiselect(prefix, "year", "Year", years, default=years)
 
     # Month filter
-    if "month_number" in df_f.columns:
-        months = sorted(df_f["month_number"].dropna().unique().tolist())
-        selected_months = st.sidebar.multiselect(
-            f"{prefix}Month (number)", months, default=months
+    months = filter_options(backend, "month_number", selection)
+    if months:
+        chosen = filter_multiselect(prefix, "month_number", "Month (number)", months, default=months)
+        # Every month the years have adds nothing to the year filter.
+        if not set(months) <= set(chosen):
+            selection["month_number"] = chosen
+
+    # LSOA / crime type filters: pick labels, filter on the surrogate keys.
+    for key, label in [("lsoa_id", "LSOA Name"), ("crime_type_id", "Crime Type")]:
+        keys = filter_options(backend, key, selection)
+        if keys and key in dims:
+            options = sorted({v for v in dims.labels(key, keys) if v is not None})
+            chosen = filter_multiselect(prefix, key, label, options, default=[])
+            selection[key] = dims.keys_for(key, chosen)
+
+    # The backend applies these (index intersection or SQL predicates).
+    return backend.normalise(selection)
+
+
+def matching_rows(backend, selection):
+    return cached_result(backend, selection, "rows", lambda: backend.count(selection))
+
+
+def export_rows(backend, selection, fmt, search="", sort=None, descending=False):
+    return export_file(backend.iter_rows(selection, search, sort, descending), fmt)
+
+
+def export_aggregate(backend, table, selection, fmt):
+    by, measures = EXPORT_AGGREGATES[table]
+    return export_file([backend.query(by, measures, selection)], fmt)
+
+
+@st.fragment
+def export_controls(backend, selection, table, search="", sort=None, descending=False, aggregate=True):
+    """Download buttons for the matching rows (and monthly aggregates) as CSV or Parquet.
+
+    Files are written chunk by chunk only when a button is clicked; the
+    format picker reruns just this panel. Streamlit serves a download from
+    memory, so row exports stop at ``EXPORT_ROW_LIMIT`` rows.
+    """
+    with st.expander("⬇️ Export data"):
+        c1, c2, c3 = st.columns([1, 2, 2])
+        fmt = c1.radio("Format", list(EXPORT_FORMATS), key=f"export_format_{table}")
+        ext, mime = EXPORT_FORMATS[fmt]
+        n_rows = backend.browse_count(selection, search) if search else matching_rows(backend, selection)
+        over_limit = n_rows > EXPORT_ROW_LIMIT
+        c2.download_button(
+            f"Matching rows ({n_rows:,})",
+            partial(export_rows, backend, selection, fmt, search, sort, descending),
+            file_name=f"{table}_rows.{ext}",
+            mime=mime,
+            on_click="ignore",
+            disabled=n_rows == 0 or over_limit,
+            help=f"Up to {EXPORT_ROW_LIMIT:,} rows.",
+            key=f"export_rows_{table}",
         )
-        if selected_months:
-            df_f = df_f[df_f["month_number"].isin(selected_months)]
-
-    # LSOA filter
-    if "lsoa_name" in df_f.columns:
-        lsoas = sorted(df_f["lsoa_name"].dropna().unique().tolist())
-        selected_lsoas = st.sidebar.multiselect(
-            f"{prefix}LSOA Name", lsoas, default=[]
-        )
-        if selected_lsoas:
-            df_f = df_f[df_f["lsoa_name"].isin(selected_lsoas)]
-
-    # Crime type filter
-    if "crime_type" in df_f.columns:
-        cts = sorted(df_f["crime_type"].dropna().unique().tolist())
-        selected_ct = st.sidebar.multiselect(
-            f"{prefix}Crime Type", cts, default=[]
-        )
-        if selected_ct:
-            df_f = df_f[df_f["crime_type"].isin(selected_ct)]
-
-    return df_f
+        if over_limit:
+            c2.caption(
+                f"Row exports are limited to {EXPORT_ROW_LIMIT:,} rows. Narrow the filters"
+                + (" or export the monthly totals." if aggregate else ".")
+            )
+        if aggregate:
+            c3.download_button(
+                "Monthly totals by LSOA and crime type",
+                partial(export_aggregate, backend, table, selection, fmt),
+                file_name=f"{table}_monthly.{ext}",
+                mime=mime,
+                on_click="ignore",
+                disabled=n_rows == 0,
+                key=f"export_monthly_{table}",
+            )
 
 
 def kpi_metric(col, label, value, fmt="{:,}"):
@@ -104,44 +392,86 @@ def kpi_metric(col, label, value, fmt="{:,}"):
 # ------------------ SIDEBAR: DATA SOURCES ------------------ #
 st.sidebar.header("📁 Data Sources")
 
-cc_df = sidebar_file_uploader("Crime Count fact_crime_count.csv", DEFAULT_CC_PATH, key="cc")
-cn_df = sidebar_file_uploader("Crime Volume & Strength fact_crime_num.csv", DEFAULT_CN_PATH, key="cn")
-ot_df = sidebar_file_uploader("Crime Time Pattern fact_occuring_time.csv", DEFAULT_OT_PATH, key="ot")
-res_df = sidebar_file_uploader("Resolution fact_resolution.csv", DEFAULT_RES_PATH, key="res")
+query_engine = st.sidebar.selectbox(
+    "Query engine",
+    available_engines(),
+    help="pandas keeps the tables in memory. duckdb / sqlite query a local copy of each default "
+    "file and fetch only aggregates. Uploaded files always use pandas.",
+)
+perf_enabled = st.sidebar.checkbox(
+    "⏱️ Performance diagnostics",
+    value=perf_trace.ENABLED_BY_DEFAULT,
+    help="Time each load, filter, computation and chart render on this rerun. "
+    "Stages are also logged as JSON lines (logger `ccc.perf`).",
+)
+perf_trace.begin(perf_enabled, engine=query_engine)
+
+# (uploader key, label, default file, fact table)
+FACT_SOURCES = [
+    ("cc", "Crime Count fact_crime_count.csv", DEFAULT_CC_PATH, "fact_crime_count"),
+    ("cn", "Crime Volume & Strength fact_crime_num.csv", DEFAULT_CN_PATH, "fact_crime_num"),
+    ("ot", "Crime Time Pattern fact_occuring_time.csv", DEFAULT_OT_PATH, "fact_occuring_time"),
+    ("res", "Resolution fact_resolution.csv", DEFAULT_RES_PATH, "fact_resolution"),
+]
+uploads = {key: sidebar_file_uploader(label, key) for key, label, _, _ in FACT_SOURCES}
+# Default files load in parallel; first paint waits for the slowest, not the sum.
+load_errors = load_default_sources(
+    [(path, table) for key, _, path, table in FACT_SOURCES if uploads[key][0] is None], query_engine
+)
+cc_backend, cn_backend, ot_backend, res_backend = (
+    source_backend(*uploads[key], path, table, engine=query_engine, error=load_errors.get(path))
+    for key, _, path, table in FACT_SOURCES
+)
 
 st.sidebar.markdown("---")
 st.sidebar.caption("Tip: Upload new CSVs to refresh the dashboards.")
 
 
-# ------------------ MAIN TABS ------------------ #
-tab_cc, tab_cn, tab_ot, tab_res, tab_data = st.tabs(
-    [
-        "📊 Crime Count",
-        "👮 Crime Volume & Police Strength",
-        "⏰ Crime Time Patterns",
-        "✅ Resolution & Outcomes",
-        "📂 Data Explorer",
-    ]
+# ------------------ VIEW SELECTOR ------------------ #
+# Only the selected dashboard runs (st.tabs would filter, aggregate and plot
+# all five on every rerun). Within a view, charts whose filters did not change
+# come straight from the result cache, and fragments rerun widgets that only
+# drive one panel on their own.
+VIEW_CC = "📊 Crime Count"
+VIEW_CN = "👮 Crime Volume & Police Strength"
+VIEW_OT = "⏰ Crime Time Patterns"
+VIEW_RES = "✅ Resolution & Outcomes"
+VIEW_DATA = "📂 Data Explorer"
+
+keep_filter_state()
+view = st.radio(
+    "Dashboard",
+    [VIEW_CC, VIEW_CN, VIEW_OT, VIEW_RES, VIEW_DATA],
+    horizontal=True,
+    key="active_view",
+    label_visibility="collapsed",
 )
 
 # ============================================================
-#  TAB 1 – CRIME COUNT (fact_crime_count)
+#  VIEW 1 – CRIME COUNT (fact_crime_count)
 # ============================================================
-with tab_cc:
+if view == VIEW_CC:
     st.title("📊 Crime Count Dashboard")
 
-    if cc_df is None or cc_df.empty:
+    if cc_backend is None or cc_backend.n_rows == 0:
         st.warning("No data available for `fact_crime_count`. Check file or upload in sidebar.")
     else:
-        filtered_cc = add_basic_filters(cc_df, prefix="[Count] ")
+        sel_cc = add_basic_filters(cc_backend, prefix="[Count] ")
 
-        if filtered_cc.empty:
+        if matching_rows(cc_backend, sel_cc) == 0:
             st.warning("No data after filters. Adjust filters in the sidebar.")
         else:
-            total_crimes = int(filtered_cc["number_of_crime"].sum())
-            total_lsoas = filtered_cc["lsoa_id"].nunique()
-            total_locations = filtered_cc["location_id"].nunique()
-            total_crime_types = filtered_cc["crime_type_id"].nunique()
+            def cc_kpis():
+                return (
+                    int(cc_backend.total("number_of_crime", selection=sel_cc)),
+                    cc_backend.nunique("lsoa_id", sel_cc),
+                    cc_backend.nunique("location_id", sel_cc),
+                    cc_backend.nunique("crime_type_id", sel_cc),
+                )
+
+            total_crimes, total_lsoas, total_locations, total_crime_types = cached_result(
+                cc_backend, sel_cc, "cc_kpis", cc_kpis
+            )
 
             c1, c2, c3, c4 = st.columns(4)
             kpi_metric(c1, "Total Crimes", total_crimes)
@@ -156,40 +486,48 @@ with tab_cc:
 
             with col1:
                 st.subheader("Crimes Over Time (Monthly)")
-                ts = (
-                    filtered_cc.groupby("year_month", as_index=False)["number_of_crime"]
-                    .sum()
-                    .sort_values("year_month")
-                )
-                fig_ts = px.bar(
-                    ts,
-                    x="year_month",
-                    y="number_of_crime",
-                    labels={"year_month": "Year-Month", "number_of_crime": "Number of Crimes"},
-                )
-                fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-                st.plotly_chart(fig_ts, use_container_width=True, key="cc_timeseries")
+
+                def cc_timeseries_figure():
+                    ts = (
+                        cc_backend.query(["year_month"], {"number_of_crime": "sum"}, sel_cc)
+                        .sort_values("year_month")
+                    )
+                    fig_ts = px.bar(
+                        ts,
+                        x="year_month",
+                        y="number_of_crime",
+                        labels={"year_month": "Year-Month", "number_of_crime": "Number of Crimes"},
+                    )
+                    fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                    return fig_ts
+
+                fig_ts = cached_result(cc_backend, sel_cc, "cc_timeseries", cc_timeseries_figure)
+                show_chart(fig_ts, key="cc_timeseries")
 
             with col2:
                 st.subheader("Top Crime Types")
-                top_types = (
-                    filtered_cc.groupby("crime_type", as_index=False)["number_of_crime"]
-                    .sum()
-                    .sort_values("number_of_crime", ascending=False)
-                    .head(10)
-                )
-                fig_top_types = px.bar(
-                    top_types,
-                    x="number_of_crime",
-                    y="crime_type",
-                    orientation="h",
-                    labels={"number_of_crime": "Number of Crimes", "crime_type": "Crime Type"},
-                )
-                fig_top_types.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    yaxis={"categoryorder": "total ascending"},
-                )
-                st.plotly_chart(fig_top_types, use_container_width=True, key="cc_toptypes")
+
+                def cc_toptypes_figure():
+                    top_types = (
+                        cc_backend.query(["crime_type"], {"number_of_crime": "sum"}, sel_cc)
+                        .sort_values("number_of_crime", ascending=False)
+                        .head(10)
+                    )
+                    fig_top_types = px.bar(
+                        top_types,
+                        x="number_of_crime",
+                        y="crime_type",
+                        orientation="h",
+                        labels={"number_of_crime": "Number of Crimes", "crime_type": "Crime Type"},
+                    )
+                    fig_top_types.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        yaxis={"categoryorder": "total ascending"},
+                    )
+                    return fig_top_types
+
+                fig_top_types = cached_result(cc_backend, sel_cc, "cc_toptypes", cc_toptypes_figure)
+                show_chart(fig_top_types, key="cc_toptypes")
 
             st.markdown("---")
 
@@ -197,70 +535,111 @@ with tab_cc:
 
             with col3:
                 st.subheader("Crimes by LSOA")
-                lsoa_sum = (
-                    filtered_cc.groupby("lsoa_name", as_index=False)["number_of_crime"]
-                    .sum()
-                    .sort_values("number_of_crime", ascending=False)
-                    .head(15)
-                )
-                fig_lsoa = px.bar(
-                    lsoa_sum,
-                    x="number_of_crime",
-                    y="lsoa_name",
-                    orientation="h",
-                    labels={"number_of_crime": "Number of Crimes", "lsoa_name": "LSOA Name"},
-                )
-                fig_lsoa.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    yaxis={"categoryorder": "total ascending"},
-                )
-                st.plotly_chart(fig_lsoa, use_container_width=True, key="cc_lsoa")
+
+                def cc_lsoa_figure():
+                    lsoa_sum = (
+                        cc_backend.query(["lsoa_name"], {"number_of_crime": "sum"}, sel_cc)
+                        .sort_values("number_of_crime", ascending=False)
+                        .head(15)
+                    )
+                    fig_lsoa = px.bar(
+                        lsoa_sum,
+                        x="number_of_crime",
+                        y="lsoa_name",
+                        orientation="h",
+                        labels={"number_of_crime": "Number of Crimes", "lsoa_name": "LSOA Name"},
+                    )
+                    fig_lsoa.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        yaxis={"categoryorder": "total ascending"},
+                    )
+                    return fig_lsoa
+
+                fig_lsoa = cached_result(cc_backend, sel_cc, "cc_lsoa", cc_lsoa_figure)
+                show_chart(fig_lsoa, key="cc_lsoa")
 
             with col4:
                 st.subheader("Crime Locations Map")
-                map_df = (
-                    filtered_cc.groupby(
-                        ["location", "longitude", "latitude"], as_index=False
-                    )["number_of_crime"]
-                    .sum()
-                    .dropna(subset=["longitude", "latitude"])
-                )
-                if not map_df.empty:
+
+                def cc_map_figure():
+                    # Few enough locations: drawn individually, as before; otherwise grid bins.
+                    map_df, cell = cc_backend.map_markers(sel_cc, MAP_MARKER_BUDGET)
+                    if cell is None:
+                        hover = dict(
+                            hover_name="location",
+                            hover_data={"number_of_crime": True, "latitude": False, "longitude": False},
+                        )
+                        caption = f"Showing {len(map_df):,} individual locations."
+                    else:
+                        hover = dict(
+                            hover_data={
+                                "number_of_crime": True,
+                                "fact_rows": True,
+                                "latitude": False,
+                                "longitude": False,
+                            },
+                        )
+                        caption = (
+                            f"Showing {len(map_df):,} grid cells of {cell:g}° "
+                            f"(≤ {MAP_MARKER_BUDGET:,} markers); narrow the filters to see individual locations."
+                        )
+
+                    if map_df.empty:
+                        return None, None
                     fig_map = px.scatter_mapbox(
                         map_df,
                         lat="latitude",
                         lon="longitude",
                         size="number_of_crime",
-                        hover_name="location",
-                        hover_data={"number_of_crime": True, "latitude": False, "longitude": False},
                         zoom=9,
+                        **hover,
                     )
                     fig_map.update_layout(
                         mapbox_style="open-street-map",
                         margin=dict(l=0, r=0, t=0, b=0),
                     )
-                    st.plotly_chart(fig_map, use_container_width=True, key="cc_map")
+                    return fig_map, caption
+
+                fig_map, map_caption = cached_result(cc_backend, sel_cc, "cc_map", cc_map_figure)
+                if fig_map is not None:
+                    show_chart(fig_map, key="cc_map")
+                    st.caption(map_caption)
                 else:
                     st.info("No valid coordinates to display on the map for current filters.")
 
+            export_controls(cc_backend, sel_cc, "fact_crime_count")
+
 # ============================================================
-#  TAB 2 – CRIME VOLUME & POLICE STRENGTH (fact_crime_num)
+#  VIEW 2 – CRIME VOLUME & POLICE STRENGTH (fact_crime_num)
 # ============================================================
-with tab_cn:
+if view == VIEW_CN:
     st.title("👮 Crime Volume & Police Strength Dashboard")
 
-    if cn_df is None or cn_df.empty:
+    if cn_backend is None or cn_backend.n_rows == 0:
         st.warning("No data available for `fact_crime_num`. Check file or upload in sidebar.")
     else:
-        filtered_cn = add_basic_filters(cn_df, prefix="[Num] ")
+        sel_cn = add_basic_filters(cn_backend, prefix="[Num] ")
 
-        if filtered_cn.empty:
+        if matching_rows(cn_backend, sel_cn) == 0:
             st.warning("No data after filters. Adjust filters in the sidebar.")
         else:
-            total_crimes = int(filtered_cn["number_of_crime"].sum())
-            avg_officer = float(filtered_cn["police_officer_strength"].mean())
-            avg_staff = float(filtered_cn["police_staff_strength"].mean())
-            avg_pcso = float(filtered_cn["pcso_strength"].mean())
+            def cn_kpis():
+                return cn_backend.query(
+                    [],
+                    {
+                        "number_of_crime": "sum",
+                        "police_officer_strength": "mean",
+                        "police_staff_strength": "mean",
+                        "pcso_strength": "mean",
+                    },
+                    sel_cn,
+                ).iloc[0]
+
+            totals = cached_result(cn_backend, sel_cn, "cn_kpis", cn_kpis)
+            total_crimes = int(totals["number_of_crime"])
+            avg_officer = float(totals["police_officer_strength"])
+            avg_staff = float(totals["police_staff_strength"])
+            avg_pcso = float(totals["pcso_strength"])
 
             c1, c2, c3, c4 = st.columns(4)
             kpi_metric(c1, "Total Crimes", total_crimes)
@@ -274,84 +653,149 @@ with tab_cn:
 
             with col1:
                 st.subheader("Crimes Over Time vs Officer Strength")
-                ts = (
-                    filtered_cn.groupby("year_month", as_index=False)
-                    .agg(
-                        number_of_crime=("number_of_crime", "sum"),
-                        police_officer_strength=("police_officer_strength", "mean"),
+
+                def cn_timeseries_figure():
+                    ts = (
+                        cn_backend.query(
+                            ["year_month"],
+                            {"number_of_crime": "sum", "police_officer_strength": "mean"},
+                            sel_cn,
+                        )
+                        .sort_values("year_month")
                     )
-                    .sort_values("year_month")
-                )
-                fig_ts = px.bar(
-                    ts,
-                    x="year_month",
-                    y="number_of_crime",
-                    labels={"year_month": "Year-Month", "number_of_crime": "Number of Crimes"},
+                    fig_ts = px.bar(
+                        ts,
+                        x="year_month",
+                        y="number_of_crime",
+                        labels={"year_month": "Year-Month", "number_of_crime": "Number of Crimes"},
+                    )
+                    fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                    return fig_ts
+
+                fig_ts = cached_result(cn_backend, sel_cn, "cn_timeseries", cn_timeseries_figure)
+                show_chart(fig_ts, key="cn_timeseries")
+
+            @st.fragment
+            def cn_scatter_panel():
+                """The large-data mode radio reruns only this panel."""
+                st.subheader("Crime vs Officer Strength (Scatter)")
+
+                scatter_labels = {
+                    "police_officer_strength": "Police Officer Strength",
+                    "number_of_crime": "Number of Crimes",
+                }
+                scatter_mode = "All points"
+                n_points = matching_rows(cn_backend, sel_cn)
+                if n_points > SCATTER_POINT_LIMIT:
+                    scatter_mode = st.radio(
+                        "Large-data mode",
+                        ["Stratified sample", "Density heatmap"],
+                        horizontal=True,
+                        key="cn_scatter_mode",
+                    )
+
+                def cn_scatter_figure():
+                    if scatter_mode == "Density heatmap":
+                        counts, xs, ys = cn_backend.density(
+                            sel_cn, "police_officer_strength", "number_of_crime"
+                        )
+                        fig_scatter = px.imshow(
+                            counts,
+                            x=xs,
+                            y=ys,
+                            origin="lower",
+                            aspect="auto",
+                            color_continuous_scale="Viridis",
+                            labels={
+                                "x": scatter_labels["police_officer_strength"],
+                                "y": scatter_labels["number_of_crime"],
+                                "color": "Fact rows",
+                            },
+                        )
+                        sent = int(counts.size)
+                        note = f"Density heatmap of {n_points:,} rows – {sent:,} cells sent."
+                    else:
+                        points = cn_backend.sample_rows(sel_cn, "crime_type_id", SCATTER_POINT_LIMIT)
+                        fig_scatter = px.scatter(
+                            points,
+                            x="police_officer_strength",
+                            y="number_of_crime",
+                            color="crime_type",
+                            hover_data=["lsoa_name", "location", "year_month"],
+                            labels=scatter_labels,
+                        )
+                        note = f"{scatter_mode}: {len(points):,} of {n_points:,} points sent."
+                    fig_scatter.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                    return fig_scatter, note
+
+                fig_scatter, scatter_note = cached_result(
+                    cn_backend, sel_cn, f"cn_scatter:{scatter_mode}", cn_scatter_figure
                 )
-                fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-                st.plotly_chart(fig_ts, use_container_width=True, key="cn_timeseries")
+                show_chart(fig_scatter, key="cn_scatter")
+                st.caption(scatter_note)
 
             with col2:
-                st.subheader("Crime vs Officer Strength (Scatter)")
-                fig_scatter = px.scatter(
-                    filtered_cn,
+                cn_scatter_panel()
+
+            st.markdown("---")
+
+            st.subheader("Crime by LSOA and Police Strength")
+
+            def cn_lsoa_strength_figure():
+                lsoa_strength = (
+                    cn_backend.query(
+                        ["lsoa_name"],
+                        {"number_of_crime": "sum", "police_officer_strength": "mean"},
+                        sel_cn,
+                    )
+                    .sort_values("number_of_crime", ascending=False)
+                    .head(15)
+                )
+
+                fig_lsoa_strength = px.scatter(
+                    lsoa_strength,
                     x="police_officer_strength",
                     y="number_of_crime",
-                    color="crime_type",
-                    hover_data=["lsoa_name", "location", "year_month"],
+                    text="lsoa_name",
                     labels={
-                        "police_officer_strength": "Police Officer Strength",
+                        "police_officer_strength": "Avg Officer Strength",
                         "number_of_crime": "Number of Crimes",
                     },
                 )
-                fig_scatter.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-                st.plotly_chart(fig_scatter, use_container_width=True, key="cn_scatter")
+                fig_lsoa_strength.update_traces(textposition="top center")
+                fig_lsoa_strength.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                return fig_lsoa_strength
 
-            st.markdown("---")
+            fig_lsoa_strength = cached_result(cn_backend, sel_cn, "cn_lsoa_strength", cn_lsoa_strength_figure)
+            show_chart(fig_lsoa_strength, key="cn_lsoa_strength")
 
-            st.subheader("Crime by LSOA and Police Strength")
-            lsoa_strength = (
-                filtered_cn.groupby("lsoa_name", as_index=False)
-                .agg(
-                    number_of_crime=("number_of_crime", "sum"),
-                    police_officer_strength=("police_officer_strength", "mean"),
-                )
-                .sort_values("number_of_crime", ascending=False)
-                .head(15)
-            )
-
-            fig_lsoa_strength = px.scatter(
-                lsoa_strength,
-                x="police_officer_strength",
-                y="number_of_crime",
-                text="lsoa_name",
-                labels={
-                    "police_officer_strength": "Avg Officer Strength",
-                    "number_of_crime": "Number of Crimes",
-                },
-            )
-            fig_lsoa_strength.update_traces(textposition="top center")
-            fig_lsoa_strength.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-            st.plotly_chart(fig_lsoa_strength, use_container_width=True, key="cn_lsoa_strength")
+            export_controls(cn_backend, sel_cn, "fact_crime_num")
 
 # ============================================================
-#  TAB 3 – CRIME TIME PATTERNS (fact_occuring_time)
+#  VIEW 3 – CRIME TIME PATTERNS (fact_occuring_time)
 # ============================================================
-with tab_ot:
+if view == VIEW_OT:
     st.title("⏰ Crime Time Patterns Dashboard")
 
-    if ot_df is None or ot_df.empty:
+    if ot_backend is None or ot_backend.n_rows == 0:
         st.warning("No data available for `fact_occuring_time`. Check file or upload in sidebar.")
     else:
-        filtered_ot = add_basic_filters(ot_df, prefix="[Time] ")
+        sel_ot = add_basic_filters(ot_backend, prefix="[Time] ")
 
-        if filtered_ot.empty:
+        if matching_rows(ot_backend, sel_ot) == 0:
             st.warning("No data after filters. Adjust filters in the sidebar.")
         else:
-            total_crimes = int(filtered_ot["number_of_crime_occuring"].sum())
-            total_lsoas = filtered_ot["lsoa_id"].nunique()
-            total_locations = filtered_ot["location_id"].nunique()
-            total_crime_types = filtered_ot["crime_type_id"].nunique()
+            def ot_kpis():
+                return (
+                    int(ot_backend.total("number_of_crime_occuring", selection=sel_ot)),
+                    ot_backend.nunique("lsoa_id", sel_ot),
+                    ot_backend.nunique("location_id", sel_ot),
+                    ot_backend.nunique("crime_type_id", sel_ot),
+                )
+
+            total_crimes, total_lsoas, total_locations, total_crime_types = cached_result(
+                ot_backend, sel_ot, "ot_kpis", ot_kpis
+            )
 
             c1, c2, c3, c4 = st.columns(4)
             kpi_metric(c1, "Total Crimes (Time Fact)", total_crimes)
@@ -362,86 +806,108 @@ with tab_ot:
             st.markdown("---")
 
             # If day_of_week exists, show weekly pattern
-            if "day_of_week" in filtered_ot.columns:
+            if "day_of_week" in ot_backend.columns:
                 st.subheader("Crimes by Day of Week")
-                dow_sum = (
-                    filtered_ot.groupby("day_of_week", as_index=False)["number_of_crime_occuring"]
-                    .sum()
-                )
-                # Optional: order days if you use Mon–Sun codes.
-                fig_dow = px.bar(
-                    dow_sum,
-                    x="day_of_week",
-                    y="number_of_crime_occuring",
-                    labels={
-                        "day_of_week": "Day of Week",
-                        "number_of_crime_occuring": "Number of Crimes",
-                    },
-                )
-                fig_dow.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-                st.plotly_chart(fig_dow, use_container_width=True, key="ot_dow")
+
+                def ot_dow_figure():
+                    dow_sum = (
+                        ot_backend.query(["day_of_week"], {"number_of_crime_occuring": "sum"}, sel_ot)
+                        .sort_values("day_of_week")
+                    )
+                    # Optional: order days if you use Mon–Sun codes.
+                    fig_dow = px.bar(
+                        dow_sum,
+                        x="day_of_week",
+                        y="number_of_crime_occuring",
+                        labels={
+                            "day_of_week": "Day of Week",
+                            "number_of_crime_occuring": "Number of Crimes",
+                        },
+                    )
+                    fig_dow.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                    return fig_dow
+
+                fig_dow = cached_result(ot_backend, sel_ot, "ot_dow", ot_dow_figure)
+                show_chart(fig_dow, key="ot_dow")
             else:
                 st.info("No `day_of_week` column in fact_occuring_time. Showing monthly trend instead.")
-                ts = (
-                    filtered_ot.groupby("year_month", as_index=False)["number_of_crime_occuring"]
-                    .sum()
-                    .sort_values("year_month")
+
+                def ot_timeseries_figure():
+                    ts = (
+                        ot_backend.query(["year_month"], {"number_of_crime_occuring": "sum"}, sel_ot)
+                        .sort_values("year_month")
+                    )
+                    fig_ts = px.bar(
+                        ts,
+                        x="year_month",
+                        y="number_of_crime_occuring",
+                        labels={
+                            "year_month": "Year-Month",
+                            "number_of_crime_occuring": "Number of Crimes",
+                        },
+                    )
+                    fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                    return fig_ts
+
+                fig_ts = cached_result(ot_backend, sel_ot, "ot_timeseries", ot_timeseries_figure)
+                show_chart(fig_ts, key="ot_timeseries")
+
+            st.markdown("---")
+
+            st.subheader("Top Crime Types (Time Fact)")
+
+            def ot_toptypes_figure():
+                ct_sum = (
+                    ot_backend.query(["crime_type"], {"number_of_crime_occuring": "sum"}, sel_ot)
+                    .sort_values("number_of_crime_occuring", ascending=False)
+                    .head(10)
                 )
-                fig_ts = px.bar(
-                    ts,
-                    x="year_month",
-                    y="number_of_crime_occuring",
+                fig_ct = px.bar(
+                    ct_sum,
+                    x="number_of_crime_occuring",
+                    y="crime_type",
+                    orientation="h",
                     labels={
-                        "year_month": "Year-Month",
                         "number_of_crime_occuring": "Number of Crimes",
+                        "crime_type": "Crime Type",
                     },
                 )
-                fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-                st.plotly_chart(fig_ts, use_container_width=True, key="ot_timeseries")
+                fig_ct.update_layout(
+                    margin=dict(l=0, r=0, t=30, b=0),
+                    yaxis={"categoryorder": "total ascending"},
+                )
+                return fig_ct
 
-            st.markdown("---")
+            fig_ct = cached_result(ot_backend, sel_ot, "ot_toptypes", ot_toptypes_figure)
+            show_chart(fig_ct, key="ot_toptypes")
 
-            st.subheader("Top Crime Types (Time Fact)")
-            ct_sum = (
-                filtered_ot.groupby("crime_type", as_index=False)["number_of_crime_occuring"]
-                .sum()
-                .sort_values("number_of_crime_occuring", ascending=False)
-                .head(10)
-            )
-            fig_ct = px.bar(
-                ct_sum,
-                x="number_of_crime_occuring",
-                y="crime_type",
-                orientation="h",
-                labels={
-                    "number_of_crime_occuring": "Number of Crimes",
-                    "crime_type": "Crime Type",
-                },
-            )
-            fig_ct.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                yaxis={"categoryorder": "total ascending"},
-            )
-            st.plotly_chart(fig_ct, use_container_width=True, key="ot_toptypes")
+            export_controls(ot_backend, sel_ot, "fact_occuring_time")
 
 # ============================================================
-#  TAB 4 – RESOLUTION & OUTCOMES (fact_resolution)
+#  VIEW 4 – RESOLUTION & OUTCOMES (fact_resolution)
 # ============================================================
-with tab_res:
+if view == VIEW_RES:
     st.title("✅ Resolution & Outcomes Dashboard")
 
-    if res_df is None or res_df.empty:
+    if res_backend is None or res_backend.n_rows == 0:
         st.warning("No data available for `fact_resolution`. Check file or upload in sidebar.")
     else:
-        filtered_res = add_basic_filters(res_df, prefix="[Res] ")
+        sel_res = add_basic_filters(res_backend, prefix="[Res] ")
 
-        if filtered_res.empty:
+        if matching_rows(res_backend, sel_res) == 0:
             st.warning("No data after filters. Adjust filters in the sidebar.")
         else:
-            total_resolutions = int(filtered_res["number_of_resolution"].sum())
-            total_outcomes = filtered_res["outcome_id"].nunique()
-            total_crime_types = filtered_res["crime_type_id"].nunique()
-            total_lsoas = filtered_res["lsoa_id"].nunique()
+            def res_kpis():
+                return (
+                    int(res_backend.total("number_of_resolution", selection=sel_res)),
+                    res_backend.nunique("outcome_id", sel_res),
+                    res_backend.nunique("crime_type_id", sel_res),
+                    res_backend.nunique("lsoa_id", sel_res),
+                )
+
+            total_resolutions, total_outcomes, total_crime_types, total_lsoas = cached_result(
+                res_backend, sel_res, "res_kpis", res_kpis
+            )
 
             c1, c2, c3, c4 = st.columns(4)
             kpi_metric(c1, "Total Resolutions", total_resolutions)
@@ -455,102 +921,220 @@ with tab_res:
 
             with col1:
                 st.subheader("Resolutions Over Time (Monthly)")
-                ts = (
-                    filtered_res.groupby("year_month", as_index=False)["number_of_resolution"]
-                    .sum()
-                    .sort_values("year_month")
-                )
-                fig_ts = px.bar(
-                    ts,
-                    x="year_month",
-                    y="number_of_resolution",
-                    labels={
-                        "year_month": "Year-Month",
-                        "number_of_resolution": "Number of Resolutions",
-                    },
-                )
-                fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-                st.plotly_chart(fig_ts, use_container_width=True, key="res_timeseries")
+
+                def res_timeseries_figure():
+                    ts = (
+                        res_backend.query(["year_month"], {"number_of_resolution": "sum"}, sel_res)
+                        .sort_values("year_month")
+                    )
+                    fig_ts = px.bar(
+                        ts,
+                        x="year_month",
+                        y="number_of_resolution",
+                        labels={
+                            "year_month": "Year-Month",
+                            "number_of_resolution": "Number of Resolutions",
+                        },
+                    )
+                    fig_ts.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                    return fig_ts
+
+                fig_ts = cached_result(res_backend, sel_res, "res_timeseries", res_timeseries_figure)
+                show_chart(fig_ts, key="res_timeseries")
 
             with col2:
                 st.subheader("Top Outcomes")
-                outcome_sum = (
-                    filtered_res.groupby("last_outcome_category", as_index=False)["number_of_resolution"]
-                    .sum()
-                    .sort_values("number_of_resolution", ascending=False)
-                    .head(10)
-                )
-                fig_outcome = px.bar(
-                    outcome_sum,
-                    x="number_of_resolution",
-                    y="last_outcome_category",
-                    orientation="h",
-                    labels={
-                        "number_of_resolution": "Number of Resolutions",
-                        "last_outcome_category": "Outcome",
-                    },
-                )
-                fig_outcome.update_layout(
-                    margin=dict(l=0, r=0, t=30, b=0),
-                    yaxis={"categoryorder": "total ascending"},
-                )
-                st.plotly_chart(fig_outcome, use_container_width=True, key="res_top_outcomes")
+
+                def res_top_outcomes_figure():
+                    outcome_sum = (
+                        res_backend.query(["last_outcome_category"], {"number_of_resolution": "sum"}, sel_res)
+                        .sort_values("number_of_resolution", ascending=False)
+                        .head(10)
+                    )
+                    fig_outcome = px.bar(
+                        outcome_sum,
+                        x="number_of_resolution",
+                        y="last_outcome_category",
+                        orientation="h",
+                        labels={
+                            "number_of_resolution": "Number of Resolutions",
+                            "last_outcome_category": "Outcome",
+                        },
+                    )
+                    fig_outcome.update_layout(
+                        margin=dict(l=0, r=0, t=30, b=0),
+                        yaxis={"categoryorder": "total ascending"},
+                    )
+                    return fig_outcome
+
+                fig_outcome = cached_result(res_backend, sel_res, "res_top_outcomes", res_top_outcomes_figure)
+                show_chart(fig_outcome, key="res_top_outcomes")
 
             st.markdown("---")
 
             st.subheader("Crime Types by Outcome")
-            ct_outcome = (
-                filtered_res.groupby(["crime_type", "last_outcome_category"], as_index=False)
-                ["number_of_resolution"]
-                .sum()
-            )
-            fig_ct_out = px.treemap(
-                ct_outcome,
-                path=["crime_type", "last_outcome_category"],
-                values="number_of_resolution",
-            )
-            fig_ct_out.update_layout(margin=dict(l=0, r=0, t=30, b=0))
-            st.plotly_chart(fig_ct_out, use_container_width=True, key="res_tree")
+
+            def res_tree_figure():
+                ct_outcome = (
+                    res_backend.query(
+                        ["crime_type", "last_outcome_category"], {"number_of_resolution": "sum"}, sel_res
+                    )
+                )
+                fig_ct_out = px.treemap(
+                    ct_outcome,
+                    path=["crime_type", "last_outcome_category"],
+                    values="number_of_resolution",
+                )
+                fig_ct_out.update_layout(margin=dict(l=0, r=0, t=30, b=0))
+                return fig_ct_out
+
+            fig_ct_out = cached_result(res_backend, sel_res, "res_tree", res_tree_figure)
+            show_chart(fig_ct_out, key="res_tree")
+
+            export_controls(res_backend, sel_res, "fact_resolution")
 
 # ============================================================
-#  TAB 5 – DATA EXPLORER
+#  VIEW 5 – DATA EXPLORER
 # ============================================================
-with tab_data:
-    st.title("📂 Data Explorer")
-
-    st.markdown("### Choose a dataset to explore")
-    dataset_name = st.selectbox(
-        "Dataset",
-        [
-            "fact_crime_count",
-            "fact_crime_num",
-            "fact_occuring_time",
-            "fact_resolution",
-        ],
-    )
-
-    df_map = {
-        "fact_crime_count": cc_df,
-        "fact_crime_num": cn_df,
-        "fact_occuring_time": ot_df,
-        "fact_resolution": res_df,
-    }
-
-    df_selected = df_map.get(dataset_name)
-
-    if df_selected is None or df_selected.empty:
-        st.warning(f"No data loaded for `{dataset_name}`.")
-    else:
-        st.write(f"Rows: **{len(df_selected):,}**, Columns: **{len(df_selected.columns)}**")
-
-        with st.expander("Preview data (first 300 rows)", expanded=True):
-            st.dataframe(df_selected.head(300))
-
-        st.markdown("### Column Summary")
-        col_summary = pd.DataFrame({
-            "column": df_selected.columns,
-            "dtype": df_selected.dtypes.astype(str),
-            "n_unique": [df_selected[c].nunique() for c in df_selected.columns],
-            "n_missing": [df_selected[c].isna().sum() for c in df_selected.columns],
-        })
-        st.dataframe(col_summary)
+if view == VIEW_DATA:
+    @st.fragment
+    def data_explorer():
+        """Dataset picker, paged browser and column summary; their widgets rerun only this view."""
+        st.title("📂 Data Explorer")
+
+        st.markdown("### Choose a dataset to explore")
+        dataset_name = st.selectbox(
+            "Dataset",
+            [
+                "fact_crime_count",
+                "fact_crime_num",
+                "fact_occuring_time",
+                "fact_resolution",
+            ],
+        )
+
+        backends = {
+            "fact_crime_count": cc_backend,
+            "fact_crime_num": cn_backend,
+            "fact_occuring_time": ot_backend,
+            "fact_resolution": res_backend,
+        }
+
+        selected = backends.get(dataset_name)
+
+        if selected is None or selected.n_rows == 0:
+            st.warning(f"No data loaded for `{dataset_name}`.")
+        else:
+            st.write(f"Rows: **{selected.n_rows:,}**, Columns: **{len(selected.columns)}**")
+
+            with st.expander("Browse rows", expanded=True):
+                # Filtering, search and sorting run in the backend; only one page is sent.
+                c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+                search = c1.text_input(
+                    "Search LSOA name, location or crime type", key=f"explorer_search_{dataset_name}"
+                ).strip()
+                sort_options = ["(file order)"] + selected.columns
+                sort_col = c2.selectbox("Sort by", sort_options, key=f"explorer_sort_{dataset_name}")
+                descending = c3.toggle("Descending", key=f"explorer_desc_{dataset_name}")
+                page_size = c4.selectbox("Rows per page", [50, 100, 300], index=1, key=f"explorer_size_{dataset_name}")
+
+                f1, f2 = st.columns(2)
+                browse_sel = {}
+                years = selected.options("year")
+                if years:
+                    browse_sel["year"] = f1.multiselect("Year", years, key=f"explorer_year_{dataset_name}")
+                if selected.options("crime_type_id") and "crime_type_id" in selected.dims:
+                    dims = selected.dims
+                    labels = sorted({v for v in dims.labels("crime_type_id", selected.options("crime_type_id")) if v is not None})
+                    chosen = f2.multiselect("Crime Type", labels, key=f"explorer_ct_{dataset_name}")
+                    browse_sel["crime_type_id"] = dims.keys_for("crime_type_id", chosen)
+                browse_sel = selected.normalise(browse_sel)
+
+                n_match = selected.browse_count(browse_sel, search)
+                n_pages = max(1, -(-n_match // page_size))
+                page_key = f"explorer_page_{dataset_name}"
+                if st.session_state.get(page_key, 1) > n_pages:
+                    st.session_state[page_key] = n_pages
+                page_no = st.number_input(f"Page (of {n_pages:,})", 1, n_pages, key=page_key)
+                offset = (page_no - 1) * page_size
+
+                with perf_trace.stage("explorer.page", rows_in=n_match, filters=filter_key(browse_sel)) as info:
+                    page = selected.page(
+                        browse_sel,
+                        search,
+                        None if sort_col == "(file order)" else sort_col,
+                        descending,
+                        offset,
+                        page_size,
+                    )
+                    info["rows_out"] = len(page)
+                st.caption(
+                    f"Rows {min(offset + 1, n_match):,}–{min(offset + page_size, n_match):,} "
+                    f"of {n_match:,} matching"
+                )
+                st.dataframe(page, hide_index=True)
+
+            # Same view as the browser (filters, search, sort), every row rather than one page.
+            export_controls(
+                selected,
+                browse_sel,
+                dataset_name,
+                search,
+                None if sort_col == "(file order)" else sort_col,
+                descending,
+                aggregate=False,
+            )
+
+            st.markdown("### Column Summary")
+            # Profiled once per dataset version and shared through the result cache.
+            col_summary = cached_result(selected, {}, "column_profile", selected.column_summary)
+            if col_summary["approx"].any():
+                st.caption("Distinct counts and top values marked `approx` are estimated (large table).")
+            st.dataframe(col_summary)
+
+        st.markdown("### Data Quality")
+        # Counts recorded when the warehouse was built; nothing here rescans the data.
+        report = get_quality_report()
+        if report is None:
+            st.caption(
+                f"No `{DEFAULT_QUALITY_PATH}` found. It is written by `python fact_builder.py` "
+                "(or `python data_quality.py`) next to the fact files."
+            )
+        else:
+            q1, q2, q3 = st.columns(3)
+            q1.metric("Staging rows checked", f"{report['rows_checked']:,}")
+            q2.metric("Rows accepted", f"{report['rows_accepted']:,}")
+            q3.metric("Rows quarantined", f"{report['rows_rejected']:,}")
+            st.caption(
+                f"Checked {report['generated_at']} · dates {report['date_range'][0]}–{report['date_range'][1]}"
+                + (f" · rejected rows in `{report['quarantine']}`" if report["quarantine"] else "")
+            )
+            rule_df, quality_cols = report_tables(report)
+            st.dataframe(rule_df, hide_index=True)
+            with st.expander("Nulls and empty strings per staging column"):
+                st.dataframe(quality_cols, hide_index=True)
+
+    data_explorer()
+
+# ------------------ SIDEBAR: CACHE STATS ------------------ #
+cache_stats = get_result_cache().stats()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['entries']}/{cache_stats['max_entries']} entries · "
+    f"{cache_stats['hits']:,} hits · {cache_stats['misses']:,} misses"
+)
+
+# ------------------ DIAGNOSTICS ------------------ #
+traced = perf_trace.finish()
+if traced is not None:
+    stages, rerun = traced
+    with st.expander(f"⏱️ Performance diagnostics – {rerun['seconds'] * 1000:,.0f} ms this rerun"):
+        st.caption(
+            f"Rerun `{rerun['rerun']}` · {rerun['stages']} stages · slowest: `{rerun['slowest']}` · "
+            f"memory Δ {rerun['mem_delta_mb'] if rerun['mem_delta_mb'] is not None else 'n/a'} MB. "
+            "Cached stages were served from the result cache."
+        )
+        if stages:
+            stage_df = pd.DataFrame(stages).drop(columns="rerun")
+            if "filters" in stage_df.columns:
+                stage_df["filters"] = stage_df["filters"].map(perf_trace.describe_filters)
+            st.dataframe(stage_df.sort_values("seconds", ascending=False), hide_index=True)
@@ -0,0 +1,61 @@
+"""Server-side decimation for row-level scatter charts.
+
+Above ``SCATTER_POINT_LIMIT`` rows a scatter is either drawn from a
+stratified sample that keeps each group's share of the rows (so colour by
+crime type stays representative) or replaced by a 2-D histogram binned on
+the server, so only ``bins x bins`` cells reach the browser.
+"""
+import numpy as np
+import pandas as pd
+
+SCATTER_POINT_LIMIT = 5000
+DENSITY_BINS = 60
+
+
+def proportional_quotas(sizes, n):
+    """Split ``n`` across groups in proportion to ``sizes`` (largest remainder, >=1 each)."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = sizes.sum()
+    if total <= n:
+        return sizes.copy()
+    exact = sizes * (n / total)
+    quotas = np.floor(exact).astype(np.int64)
+    quotas[(quotas == 0) & (sizes > 0)] = 1
+    spare = n - quotas.sum()
+    if spare > 0:
+        order = np.argsort(-(exact - np.floor(exact)), kind="stable")
+        quotas[order[:spare]] += 1
+    return np.minimum(quotas, sizes)
+
+
+def stratified_sample(df, by, n, seed=0):
+    """At most ~``n`` rows of ``df`` with each ``by`` group's share preserved."""
+    if len(df) <= n:
+        return df
+    codes, _ = pd.factorize(df[by], use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    quotas = proportional_quotas(sizes, n)
+
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(df)), codes))
+    # Rank of each row inside its group after the random shuffle.
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(len(df)) - starts[codes[order]]
+    keep = np.sort(order[rank < quotas[codes[order]]])
+    return df.take(keep)
+
+
+def density_grid(df, x, y, bins=DENSITY_BINS, weight=None):
+    """2-D histogram of ``x`` vs ``y`` as (counts, x bin centres, y bin centres).
+
+    ``weight`` names a per-row count column, for input already grouped on (x, y).
+    """
+    data = df[[x, y] + ([weight] if weight else [])].dropna(subset=[x, y])
+    xs = data[x].to_numpy(dtype=np.float64)
+    ys = data[y].to_numpy(dtype=np.float64)
+    weights = data[weight].to_numpy(dtype=np.float64) if weight else None
+    counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins, weights=weights)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+    # histogram2d is indexed [x, y]; images are [row=y, col=x].
+    return counts.T, x_centres, y_centres
@@ -0,0 +1,120 @@
+"""Column profiles for the Data Explorer.
+
+``profile_frame`` reports dtype, distinct and missing counts, min / max and
+the most frequent values of every column. Each column is reduced to integer
+codes once (a categorical's own codes, or ``pd.factorize``) and every
+statistic is read off those codes and a single ``bincount``, instead of one
+full scan per statistic.
+
+Above ``EXACT_DISTINCT_ROWS`` rows, non-categorical columns are not
+factorised: the distinct count comes from a HyperLogLog sketch over the
+hashed values (about 1.6% standard error) and the top values from a strided
+sample. Those rows are flagged ``approx``.
+"""
+import numpy as np
+import pandas as pd
+
+# ------------------ SETTINGS ------------------ #
+EXACT_DISTINCT_ROWS = 500_000
+PROFILE_SAMPLE_ROWS = 100_000
+TOP_VALUES = 3
+HLL_PRECISION = 12  # 4,096 registers
+
+PROFILE_COLUMNS = ["column", "dtype", "n_unique", "n_missing", "min", "max", "top_values", "approx"]
+
+
+# ------------------ SKETCH ------------------ #
+class HyperLogLog:
+    """Mergeable distinct-count sketch over 64-bit hashes."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return self
+        p = self.precision
+        bucket = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        # The remaining 64 - p bits fit exactly in a float64, so frexp gives their bit length.
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (64 - p - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, bucket, rank)
+        return self
+
+    def add(self, values):
+        """Add the non-missing entries of ``values`` (any Series / array)."""
+        values = pd.Series(values)
+        return self.add_hashes(pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy())
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting).
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+# ------------------ PROFILE ------------------ #
+def _text(value):
+    # str() keeps float32 values short (f-strings widen them to float64 first).
+    return "" if value is None or (np.isscalar(value) and pd.isna(value)) else str(value)
+
+
+def format_top(values, counts):
+    return ", ".join(f"{_text(v)} ({int(n):,})" for v, n in zip(values, counts))
+
+
+def _from_codes(codes, uniques, top_k):
+    """(n_unique, n_missing, min, max, top values) from factorised codes."""
+    present = codes >= 0
+    counts = np.bincount(codes[present], minlength=len(uniques))
+    seen = np.flatnonzero(counts)
+    values = pd.Index(uniques).take(seen)
+    order = seen[np.argsort(-counts[seen], kind="stable")[:top_k]]
+    lo = hi = None
+    if len(values):
+        try:
+            lo, hi = values.min(), values.max()
+        except TypeError:  # unorderable mixed values
+            pass
+    top = format_top(np.asarray(uniques)[order], counts[order])
+    return len(seen), int(len(codes) - present.sum()), lo, hi, top
+
+
+def profile_column(series, exact_rows=EXACT_DISTINCT_ROWS, top_k=TOP_VALUES):
+    """Profile row (dict with ``PROFILE_COLUMNS``) for one column."""
+    row = {"column": series.name, "dtype": str(series.dtype), "approx": False}
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+        stats = _from_codes(codes, uniques, top_k)
+    elif len(series) <= exact_rows:
+        codes, uniques = pd.factorize(series)
+        stats = _from_codes(codes, uniques, top_k)
+    else:
+        present = series.notna()
+        values = series[present]
+        step = max(1, len(values) // PROFILE_SAMPLE_ROWS)
+        codes, uniques = pd.factorize(values.iloc[::step])
+        top = _from_codes(codes, uniques, top_k)[4]
+        lo, hi = (values.min(), values.max()) if len(values) else (None, None)
+        stats = (HyperLogLog().add(values).estimate(), int(len(series) - present.sum()), lo, hi, top)
+        row["approx"] = True
+    row["n_unique"], row["n_missing"], lo, hi, row["top_values"] = stats
+    row["min"], row["max"] = _text(lo), _text(hi)
+    return row
+
+
+def profile_frame(df, exact_rows=EXACT_DISTINCT_ROWS, top_k=TOP_VALUES):
+    """One profile row per column of ``df``."""
+    rows = [profile_column(df[c], exact_rows, top_k) for c in df.columns]
+    return pd.DataFrame(rows, columns=PROFILE_COLUMNS)
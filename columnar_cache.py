@@ -0,0 +1,147 @@
+"""On-disk columnar cache for the fact CSVs read by the dashboard.
+
+The first read of a CSV parses it and writes the typed result to an
+uncompressed Arrow IPC file under ``CACHE_DIR``. Later reads memory-map that
+file instead of re-parsing the text. The CSV is only parsed again when its
+path, size, mtime and content hash no longer match the cache entry.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+# ------------------ SETTINGS ------------------ #
+CACHE_DIR = os.environ.get("CCC_CACHE_DIR", ".fact_cache")
+# Bump when the parse / standardisation step changes so stale files are rebuilt.
+CACHE_VERSION = 2
+HASH_BLOCK_SIZE = 1 << 20
+
+
+# ------------------ KEYS ------------------ #
+def file_signature(path):
+    """Cheap identity of a source file: absolute path, size and mtime."""
+    st = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def content_hash(path):
+    """Hash the file contents block by block (never holds the file in memory)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _entry_paths(source_path, cache_dir):
+    abs_path = os.path.abspath(source_path)
+    key = hashlib.blake2b(abs_path.encode("utf-8"), digest_size=8).hexdigest()
+    stem = f"{os.path.splitext(os.path.basename(abs_path))[0]}-{key}"
+    base = os.path.join(cache_dir, stem)
+    return base + ".arrow", base + ".json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(tmp, meta_path)
+
+
+# ------------------ ARROW IO ------------------ #
+def write_arrow(df, data_path):
+    """Write ``df`` as an uncompressed Arrow IPC file (atomic replace)."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = data_path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, data_path)
+
+
+def chunk_schema(table, text_columns=()):
+    """Schema of ``table`` with int32 dictionary indices, so later chunks whose
+    categoricals have more categories (wider pandas codes) still match it.
+
+    Dictionaries of ``text_columns``, and any the first chunk left untyped
+    (an all-null categorical), hold strings rather than the inferred type.
+    """
+    fields = []
+    for f in table.schema:
+        if pa.types.is_dictionary(f.type):
+            value_type = f.type.value_type
+            if f.name in text_columns or pa.types.is_null(value_type):
+                value_type = pa.large_string()
+            f = pa.field(f.name, pa.dictionary(pa.int32(), value_type))
+        fields.append(f)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def read_arrow(data_path):
+    """Memory-map an Arrow IPC file and return it as a DataFrame."""
+    source = pa.memory_map(data_path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+# ------------------ CACHE ------------------ #
+def read_cached_csv(path, parse=pd.read_csv, cache_dir=None):
+    """Return ``parse(path)``, served from the columnar cache when still valid.
+
+    The entry is reused as-is when size and mtime are unchanged. When they
+    differ the contents are hashed, so a touched-but-identical file is not
+    re-parsed either.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = _entry_paths(path, cache_dir)
+
+    sig = file_signature(path)
+    meta = _read_meta(meta_path)
+    usable = (
+        meta is not None
+        and meta.get("version") == CACHE_VERSION
+        and meta.get("path") == sig["path"]
+        and os.path.exists(data_path)
+    )
+
+    if usable and meta["size"] == sig["size"] and meta["mtime_ns"] == sig["mtime_ns"]:
+        return _with_fingerprint(read_arrow(data_path), meta["content_hash"])
+
+    digest = content_hash(path)
+    if usable and meta["content_hash"] == digest:
+        _write_meta(meta_path, {**meta, **sig})
+        return _with_fingerprint(read_arrow(data_path), digest)
+
+    df = parse(path)
+    write_arrow(df, data_path)
+    _write_meta(
+        meta_path,
+        {**sig, "content_hash": digest, "version": CACHE_VERSION, "rows": len(df)},
+    )
+    return _with_fingerprint(read_arrow(data_path), digest)
+
+
+def _with_fingerprint(df, digest):
+    # Downstream caches (filter index, results) key on this instead of hashing the frame.
+    df.attrs["fingerprint"] = f"{digest}-v{CACHE_VERSION}"
+    return df
+
+
+def fingerprint_digest(fingerprint):
+    """Content hash part of a fingerprint set by ``read_cached_csv``."""
+    return fingerprint.rsplit("-v", 1)[0]
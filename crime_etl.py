@@ -0,0 +1,213 @@
+"""Streaming Python port of the ``ETL_Process_Crime.R`` staging pipeline.
+
+Produces the same ``crime_df`` staging columns as the R script, but never
+holds the whole extract in memory: every monthly police CSV is read in
+fixed-size chunks, transformed, joined to the (small) police strength table
+and appended as a row group to its own Parquet part file. Files are
+processed in parallel across a process pool, so peak memory is roughly
+``workers x chunksize`` rows.
+
+Usage::
+
+    python crime_etl.py CRIME_CSV_DIR POLICE_STRENGTH.csv --out crime_df_staging
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ------------------ SETTINGS ------------------ #
+DEFAULT_CHUNKSIZE = 250_000
+
+RAW_COLUMNS = [
+    "Crime ID",
+    "Month",
+    "Reported by",
+    "Falls within",
+    "Longitude",
+    "Latitude",
+    "Location",
+    "LSOA code",
+    "LSOA name",
+    "Crime type",
+    "Last outcome category",
+]
+
+POLICE_COLUMNS = ["Police_Officer_Strength", "Police_Staff_Strength", "PCSO_Strength"]
+
+# Column order and types of the crime_df staging table.
+STAGING_SCHEMA = pa.schema([
+    ("Date", pa.string()),
+    ("Year", pa.int16()),
+    ("Month", pa.int16()),
+    ("LSOA_code", pa.string()),
+    ("LSOA_name", pa.string()),
+    ("Location", pa.string()),
+    ("Longitude", pa.float64()),
+    ("Latitude", pa.float64()),
+    ("Crime_type", pa.string()),
+    ("Last_outcome_category", pa.string()),
+    ("Police_Officer_Strength", pa.float64()),
+    ("Police_Staff_Strength", pa.float64()),
+    ("PCSO_Strength", pa.float64()),
+])
+
+BEHAVIOURAL_CRIME_TYPE = "Anti-social behaviour"
+BEHAVIOURAL_OUTCOME = "Behavioral issues"
+
+
+# ------------------ POLICE STRENGTH ------------------ #
+def _snake(name):
+    return re.sub(r"[^0-9A-Za-z]+", "_", name.strip()).strip("_")
+
+
+def load_police_strength(path):
+    """Police strength table keyed by ``Date`` ("YYYY-MM"), as in the R script."""
+    police = pd.read_csv(path)
+    # "Police Officer Strength" / "Police.Officer.Strength" -> Police_Officer_Strength
+    police.columns = [_snake(c) for c in police.columns]
+    # Drop rows where the date and every strength figure are missing.
+    police = police[~police[["Date"] + POLICE_COLUMNS].isna().all(axis=1)]
+    police["Date"] = pd.to_datetime(police["Date"], format="%m/%d/%Y", errors="coerce").dt.strftime("%Y-%m")
+    return police[["Date"] + POLICE_COLUMNS].reset_index(drop=True)
+
+
+# ------------------ TRANSFORM ------------------ #
+def transform_chunk(raw, police):
+    """Apply the R cleaning / business rules to one raw chunk.
+
+    Returns (staging frame, number of rows dropped for missing coordinates).
+    """
+    missing_coord = raw["Longitude"].isna() & raw["Latitude"].isna()
+    df = raw.loc[~missing_coord]
+
+    outcome = df["Last outcome category"].where(
+        df["Crime type"] != BEHAVIOURAL_CRIME_TYPE, BEHAVIOURAL_OUTCOME
+    )
+
+    month = df["Month"].astype("string").str.strip()
+    parsed = pd.to_datetime(month + "-01", format="%Y-%m-%d", errors="coerce")
+
+    out = pd.DataFrame({
+        "Date": parsed.dt.strftime("%Y-%m"),
+        "Year": pd.to_numeric(month.str[:4], errors="coerce"),
+        "Month": pd.to_numeric(month.str[5:7], errors="coerce"),
+        "LSOA_code": df["LSOA code"],
+        "LSOA_name": df["LSOA name"],
+        "Location": df["Location"],
+        "Longitude": df["Longitude"],
+        "Latitude": df["Latitude"],
+        "Crime_type": df["Crime type"],
+        "Last_outcome_category": outcome,
+    })
+    out = out.merge(police, on="Date", how="left")
+    for col in ("Year", "Month"):
+        out[col] = out[col].astype("Int16")
+    return out, int(missing_coord.sum())
+
+
+def read_raw_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield raw chunks of one monthly CSV restricted to the columns the ETL uses."""
+    text_cols = [c for c in RAW_COLUMNS if c not in ("Longitude", "Latitude")]
+    return pd.read_csv(
+        path,
+        usecols=lambda c: c in RAW_COLUMNS,
+        dtype={**{c: "string" for c in text_cols}, "Longitude": "float64", "Latitude": "float64"},
+        chunksize=chunksize,
+    )
+
+
+def to_arrow(df):
+    return pa.Table.from_pandas(df[STAGING_SCHEMA.names], schema=STAGING_SCHEMA, preserve_index=False)
+
+
+# ------------------ PIPELINE ------------------ #
+def part_path(out_dir, source):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(out_dir, f"part-{_snake(stem)}.parquet")
+
+
+def process_file(path, police, out_dir, chunksize=DEFAULT_CHUNKSIZE):
+    """Stream one CSV into its Parquet part. Returns per-file row statistics."""
+    target = part_path(out_dir, path)
+    # Hidden temp name so dataset readers never pick up a half-written part.
+    tmp = os.path.join(out_dir, f".{os.path.basename(target)}.tmp")
+    stats = {"file": path, "rows_read": 0, "missing_coordinates": 0, "rows_written": 0}
+    writer = None
+    try:
+        for raw in read_raw_chunks(path, chunksize):
+            staged, dropped = transform_chunk(raw, police)
+            stats["rows_read"] += len(raw)
+            stats["missing_coordinates"] += dropped
+            stats["rows_written"] += len(staged)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, STAGING_SCHEMA)
+            writer.write_table(to_arrow(staged))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # Header-only file: still leave an empty, schema-correct part behind.
+        pq.write_table(STAGING_SCHEMA.empty_table(), tmp)
+    os.replace(tmp, target)
+    stats["part"] = target
+    return stats
+
+
+def list_sources(crime_dir):
+    return sorted(glob.glob(os.path.join(crime_dir, "*.csv")))
+
+
+def run(crime_dir, police_path, out_dir, workers=None, chunksize=DEFAULT_CHUNKSIZE, log=print):
+    """Run the staging ETL for every CSV in ``crime_dir``; returns the per-file stats."""
+    sources = list_sources(crime_dir)
+    if not sources:
+        raise FileNotFoundError(f"No CSV files found in {crime_dir!r}")
+    os.makedirs(out_dir, exist_ok=True)
+    police = load_police_strength(police_path)
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(process_file, path, police, out_dir, chunksize) for path in sources]
+        for future in as_completed(futures):
+            stats = future.result()
+            results.append(stats)
+            log(f"{os.path.basename(stats['file'])}: {stats['rows_written']:,} rows staged")
+
+    results.sort(key=lambda s: s["file"])
+    read = sum(s["rows_read"] for s in results)
+    dropped = sum(s["missing_coordinates"] for s in results)
+    written = sum(s["rows_written"] for s in results)
+    log(f"Rows read: {read:,}")
+    log(f"Rows with missing coordinates removed: {dropped:,}")
+    log(f"Rows staged: {written:,} in {time.perf_counter() - started:.1f}s -> {out_dir}")
+    return results
+
+
+def read_staging(out_dir, columns=None):
+    """Load the staging parts back as one DataFrame (or a column subset of it)."""
+    return pq.read_table(out_dir, columns=columns).to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream monthly crime CSVs into Parquet staging.")
+    parser.add_argument("crime_dir", help="Folder with the monthly police CSV files")
+    parser.add_argument("police_csv", help="Police force strength CSV")
+    parser.add_argument("--out", default="crime_df_staging", help="Output folder for Parquet parts")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPUs)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    args = parser.parse_args(argv)
+    run(args.crime_dir, args.police_csv, args.out, args.workers, args.chunksize)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Chunked CSV / Parquet export of fact rows and aggregates.
+
+``export_file`` writes an iterator of DataFrame chunks (the backends'
+``iter_rows``, or a single aggregated frame) to a temporary file one chunk
+at a time, so rows are fetched and encoded a chunk at a time rather than as
+one frame plus one string. The dashboard passes it to ``st.download_button``
+as a callable, so nothing is generated until the button is clicked.
+
+The finished file itself is not streamed: Streamlit reads it into the
+session's in-memory media storage to serve the download. Row exports are
+therefore capped at ``EXPORT_ROW_LIMIT`` rows.
+"""
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from columnar_cache import chunk_schema
+
+# ------------------ SETTINGS ------------------ #
+EXPORT_CHUNK_ROWS = 100_000
+# Largest row export offered (about 60 MB of CSV), since the file is held in memory to be served.
+EXPORT_ROW_LIMIT = 500_000
+# label -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+# ------------------ WRITERS ------------------ #
+def write_csv(chunks, sink):
+    """Append each chunk to ``sink`` as CSV (header from the first chunk); returns rows written."""
+    rows = 0
+    for chunk in chunks:
+        sink.write(chunk.to_csv(index=False, header=rows == 0).encode("utf-8"))
+        rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks, sink):
+    """Write each chunk to ``sink`` as one Parquet row group; returns rows written."""
+    rows, writer = 0, None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = chunk_schema(pa.Table.from_pandas(chunk, preserve_index=False))
+                writer = pq.ParquetWriter(sink, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+_WRITERS = {"CSV": write_csv, "Parquet": write_parquet}
+
+
+def export_file(chunks, fmt="CSV"):
+    """Write ``chunks`` in ``fmt`` (a key of ``EXPORT_FORMATS``) and return the file's bytes.
+
+    The temporary file is closed and removed before returning.
+    """
+    with tempfile.TemporaryFile(prefix="ccc-export-", suffix="." + EXPORT_FORMATS[fmt][0]) as sink:
+        _WRITERS[fmt](chunks, sink)
+        sink.seek(0)
+        return sink.read()
@@ -0,0 +1,300 @@
+"""Vectorised data-quality checks for the crime staging data.
+
+``ETL_Process_Crime.R`` prints NA counts, empty-string counts and the
+missing-coordinate check to the console, one full scan each. ``QualityCheck``
+runs every rule in one pass over each staging batch instead:
+
+- nulls and empty strings per column (counted),
+- coordinates outside ``COORDINATE_BOUNDS`` (rejected),
+- dates that do not parse or fall outside ``dim_date`` (2020-2025, rejected),
+- orphan dimension keys: LSOA, location or crime type values that can never
+  join to a dimension member (null, or blank where the dimension skips
+  blanks) and would silently drop out of the facts (rejected).
+
+Text rules are evaluated on each column's distinct values and broadcast back
+through the factorised codes. Rejected rows go to a quarantine Parquet file
+with the rules they broke, and the counts to ``quality_report.json``, which
+the dashboard reads without touching the data.
+
+``fact_builder.py`` runs the check inside its single scan and writes both
+files next to the facts. ``incremental_load.py`` checks again only the
+staging parts it rescans and carries the other parts' counts and
+quarantined rows over from the last report. Standalone::
+
+    python data_quality.py crime_df_staging --out .
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from crime_etl import STAGING_SCHEMA
+from fact_builder import (
+    BATCH_ROWS,
+    DATE_RANGE,
+    DIMENSIONS,
+    FACT_KEYS,
+    NATURAL_KEYS,
+    build_dim_date,
+    iter_staging_batches,
+    parse_date_id,
+)
+
+# ------------------ SETTINGS ------------------ #
+REPORT_NAME = "quality_report.json"
+QUARANTINE_NAME = "quality_quarantine.parquet"
+# England, Wales and Northern Ireland with a margin (police.uk coverage).
+COORDINATE_BOUNDS = {"longitude": (-8.7, 1.8), "latitude": (49.8, 56.0)}
+
+# (rule, staging column, reject blanks too) for the keys every fact joins on.
+ORPHAN_RULES = [
+    (f"orphan_{key}", col, skip_blank)
+    for col, _, key, _, skip_blank in DIMENSIONS
+    if key in FACT_KEYS
+]
+RULES = {
+    "date_unknown": f"Date missing, unparseable or outside dim_date ({DATE_RANGE[0]}-{DATE_RANGE[1]})",
+    "coordinates_out_of_range": "Longitude / latitude outside the UK bounding box",
+    **{rule: f"{col} cannot join to its dimension (null{' or blank' if blank else ''})"
+       for rule, col, blank in ORPHAN_RULES},
+}
+
+
+# ------------------ RULES ------------------ #
+def _text_flags(series):
+    """(null, blank) boolean arrays, evaluated once per distinct value."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    blank = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.strip().eq("").to_numpy()
+    # Null rows (code -1) pick the trailing False.
+    return codes < 0, np.append(blank, False)[codes]
+
+
+def check_batch(batch, bounds=COORDINATE_BOUNDS, valid_dates=None):
+    """All rules over one staging batch.
+
+    Returns ({rule: rejected rows mask}, {column: nulls}, {column: empty strings}).
+    """
+    nulls, empty, flags = {}, {}, {}
+    for col in batch.columns:
+        if col in NATURAL_KEYS:
+            flags[col] = _text_flags(batch[col])
+            nulls[col], empty[col] = int(flags[col][0].sum()), int(flags[col][1].sum())
+        else:
+            nulls[col] = int(batch[col].isna().sum())
+
+    if valid_dates is None:
+        valid_dates = build_dim_date()["date_id"].to_numpy()
+    rejected = {"date_unknown": ~np.isin(parse_date_id(batch["Date"]), valid_dates)}
+
+    outside = np.zeros(len(batch), dtype=bool)
+    for col, (lo, hi) in (("Longitude", bounds["longitude"]), ("Latitude", bounds["latitude"])):
+        if col in batch.columns:
+            values = batch[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                outside |= (values < lo) | (values > hi)
+    rejected["coordinates_out_of_range"] = outside
+
+    for rule, col, skip_blank in ORPHAN_RULES:
+        null, blank = flags[col]
+        rejected[rule] = null | blank if skip_blank else null
+    return rejected, nulls, empty
+
+
+# Part name of rows checked from an in-memory DataFrame rather than staging files.
+FRAME_PART = "(frame)"
+
+
+def _new_stats():
+    return {"rows_checked": 0, "rows_rejected": 0, "rules": dict.fromkeys(RULES, 0), "nulls": {}, "empty_strings": {}}
+
+
+def _add_counts(into, counts):
+    for key, n in counts.items():
+        into[key] = into.get(key, 0) + n
+
+
+class QualityCheck:
+    """Callable batch filter for ``fact_builder.scan_staging`` that accumulates the report.
+
+    ``check(batch)`` returns the accepted rows; rejected rows are appended to
+    the quarantine file (when ``quarantine_path`` is set) with the staging
+    part they came from and a ``rejected_by`` column listing the rules they
+    broke. Counts are kept per staging part.
+
+    For an incremental run, ``previous`` is the last report and ``rechecked``
+    the staging parts being checked again: the other parts' counts and
+    quarantined rows are carried over, so the result matches a full check.
+    """
+
+    def __init__(self, quarantine_path=None, bounds=COORDINATE_BOUNDS, previous=None, rechecked=()):
+        self.quarantine_path = quarantine_path
+        self.bounds = bounds
+        self.valid_dates = build_dim_date()["date_id"].to_numpy()
+        self.parts = {}
+        rechecked = set(rechecked)
+        self._carried = {
+            part: stats for part, stats in ((previous or {}).get("parts") or {}).items() if part not in rechecked
+        }
+        self._writer = None
+        self._started = time.perf_counter()
+
+    def __call__(self, batch):
+        part = batch.attrs.get("part", FRAME_PART)
+        stats = self.parts.setdefault(part, _new_stats())
+        rejected, nulls, empty = check_batch(batch, self.bounds, self.valid_dates)
+        _add_counts(stats["nulls"], nulls)
+        _add_counts(stats["empty_strings"], empty)
+        any_rejected = np.zeros(len(batch), dtype=bool)
+        for rule, mask in rejected.items():
+            stats["rules"][rule] += int(mask.sum())
+            any_rejected |= mask
+        stats["rows_checked"] += len(batch)
+        stats["rows_rejected"] += int(any_rejected.sum())
+        if any_rejected.any() and self.quarantine_path:
+            self._quarantine(batch[any_rejected], {rule: mask[any_rejected] for rule, mask in rejected.items()}, part)
+        return batch[~any_rejected]
+
+    def _quarantine(self, rows, rejected, part):
+        reasons = np.full(len(rows), "", dtype=object)
+        for rule, mask in rejected.items():
+            reasons = np.where(mask, reasons + rule + ",", reasons)
+        rows = rows.assign(
+            staging_part=part, rejected_by=pd.Series(reasons, index=rows.index).str.rstrip(",")
+        )
+        self._write(pa.Table.from_pandas(rows, preserve_index=False))
+
+    def _write(self, table):
+        if self._writer is None:
+            fields = [STAGING_SCHEMA.field(c) for c in table.column_names if c in STAGING_SCHEMA.names]
+            extra = [pa.field("staging_part", pa.string()), pa.field("rejected_by", pa.string())]
+            self._schema = pa.schema(fields + extra)
+            self._writer = pq.ParquetWriter(self.quarantine_path + ".tmp", self._schema)
+        self._writer.write_table(table.select(self._schema.names).cast(self._schema))
+
+    def _carry_quarantine(self):
+        # Rows quarantined earlier from parts that were not checked again.
+        previous = pq.ParquetFile(self.quarantine_path)
+        if "staging_part" not in previous.schema_arrow.names:
+            return
+        keep = pa.array(list(self._carried), pa.string())
+        for batch in previous.iter_batches():
+            rows = pa.Table.from_batches([batch]).filter(pc.is_in(batch.column("staging_part"), value_set=keep))
+            if rows.num_rows:
+                self._write(rows)
+
+    def close(self):
+        """Finish the quarantine file (removing a stale one when nothing was rejected)."""
+        if self.quarantine_path is None:
+            return
+        if self._carried and os.path.exists(self.quarantine_path):
+            self._carry_quarantine()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self.quarantine_path + ".tmp", self.quarantine_path)
+        elif os.path.exists(self.quarantine_path):
+            os.remove(self.quarantine_path)
+
+    def report(self, source=None):
+        """Machine-readable summary of everything checked so far (plus carried-over parts)."""
+        parts = {**self._carried, **self.parts}
+        total = _new_stats()
+        for stats in parts.values():
+            total["rows_checked"] += stats["rows_checked"]
+            total["rows_rejected"] += stats["rows_rejected"]
+            for key in ("rules", "nulls", "empty_strings"):
+                _add_counts(total[key], stats[key])
+        return {
+            "generated_at": pd.Timestamp.now(tz="UTC").isoformat(timespec="seconds"),
+            "source": None if isinstance(source, pd.DataFrame) else source,
+            "seconds": round(time.perf_counter() - self._started, 3),
+            "rows_checked": total["rows_checked"],
+            "rows_rejected": total["rows_rejected"],
+            "rows_accepted": total["rows_checked"] - total["rows_rejected"],
+            "rules": {
+                rule: {"rows": total["rules"].get(rule, 0), "action": "reject", "description": text}
+                for rule, text in RULES.items()
+            },
+            "nulls": total["nulls"],
+            "empty_strings": total["empty_strings"],
+            "date_range": list(DATE_RANGE),
+            "coordinate_bounds": self.bounds,
+            "quarantine": (
+                os.path.basename(self.quarantine_path)
+                if self.quarantine_path and total["rows_rejected"] else None
+            ),
+            "parts": parts,
+        }
+
+
+# ------------------ REPORT IO ------------------ #
+def write_report(report, out_dir):
+    """Write ``quality_report.json`` under ``out_dir`` (atomic replace); returns its path."""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, REPORT_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def read_report(path=REPORT_NAME):
+    """The report dict, or None when no readable report exists."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def report_tables(report):
+    """(rules, columns) DataFrames for display: rows rejected per rule, nulls / blanks per column."""
+    checked = max(report["rows_checked"], 1)
+    rules = pd.DataFrame([
+        {"rule": rule, "rows": r["rows"], "share_pct": round(100 * r["rows"] / checked, 3),
+         "action": r["action"], "description": r["description"]}
+        for rule, r in report["rules"].items()
+    ])
+    columns = pd.DataFrame({"nulls": pd.Series(report["nulls"]), "empty_strings": pd.Series(report["empty_strings"])})
+    columns = columns.fillna(0).astype("int64").rename_axis("column").reset_index()
+    return rules, columns
+
+
+# ------------------ STANDALONE ------------------ #
+def validate(source, out_dir=".", batch_rows=BATCH_ROWS):
+    """Check every staging batch without building the warehouse; returns the report."""
+    check = QualityCheck(os.path.join(out_dir, QUARANTINE_NAME))
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        for batch in iter_staging_batches(source, batch_rows):
+            check(batch)
+    finally:
+        check.close()
+    report = check.report(source)
+    write_report(report, out_dir)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check crime staging data and write a quality report.")
+    parser.add_argument("staging", help="Parquet staging folder written by crime_etl.py")
+    parser.add_argument("--out", default=".", help=f"Folder for {REPORT_NAME} and {QUARANTINE_NAME}")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args(argv)
+    report = validate(args.staging, args.out, args.batch_rows)
+    print(f"Rows checked: {report['rows_checked']:,}, rejected: {report['rows_rejected']:,}")
+    for rule, r in report["rules"].items():
+        print(f"  {rule}: {r['rows']:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,461 @@
+"""Single-pass builder for the warehouse dimensions and the four fact tables.
+
+``Crime_df_warehouse_code.sql`` builds each fact table with its own full scan
+of ``crime_df``, repeating the dimension joins and the ``split_part(trim("Date"))``
+parsing four times. This module scans the staging data once, batch by batch:
+text keys are encoded to integer codes by append-only dictionaries and each
+batch is reduced to partial aggregates on those codes. The dimensions are
+built from the dictionaries afterwards (sorted, ids from 1), codes are
+remapped to surrogate keys with array lookups, and all four facts are derived
+from one shared aggregation at the finest grain (date, LSOA, location, crime
+type, outcome).
+
+Output files match what the dashboard loads (``fact_crime_count.csv`` ...)
+plus ``dim_*.csv``. ``--benchmark`` times the build against a pandas port of
+the four-scan SQL path and checks that both produce the same facts.
+
+Each staging batch first goes through the ``data_quality`` checks; rejected
+rows are quarantined and ``quality_report.json`` is written with the tables
+(``--no-quality`` skips this).
+
+Usage::
+
+    python fact_builder.py crime_df_staging --out warehouse [--star] [--benchmark]
+"""
+import argparse
+import calendar
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from star_schema import key_only
+
+# ------------------ SETTINGS ------------------ #
+DATE_RANGE = (2020, 2025)  # dim_date: generate_series(2020, 2025)
+BATCH_ROWS = 500_000
+
+NATURAL_KEYS = ["Date", "LSOA_name", "LSOA_code", "Location", "Crime_type", "Last_outcome_category"]
+VALUE_COLUMNS = [
+    "Longitude",
+    "Latitude",
+    "Police_Officer_Strength",
+    "Police_Staff_Strength",
+    "PCSO_Strength",
+]
+STAGING_COLUMNS = NATURAL_KEYS + VALUE_COLUMNS
+
+FACT_KEYS = ["date_id", "lsoa_id", "location_id", "crime_type_id"]
+STRENGTHS = {
+    "Police_Officer_Strength": "police_officer_strength",
+    "Police_Staff_Strength": "police_staff_strength",
+    "PCSO_Strength": "pcso_strength",
+}
+
+# Column order of each fact table, as in the DDL.
+FACT_COLUMNS = {
+    "fact_occuring_time": [
+        "date_id", "year", "month_number", "lsoa_id", "lsoa_name", "location_id", "location",
+        "longitude", "latitude", "crime_type_id", "crime_type", "number_of_crime_occuring",
+    ],
+    "fact_resolution": [
+        "date_id", "year", "month_number", "lsoa_id", "lsoa_name", "location_id", "location",
+        "longitude", "latitude", "police_officer_strength", "police_staff_strength",
+        "pcso_strength", "crime_type_id", "crime_type", "outcome_id", "last_outcome_category",
+        "number_of_resolution",
+    ],
+    "fact_crime_count": [
+        "date_id", "year", "month_number", "lsoa_id", "lsoa_name", "location_id", "location",
+        "longitude", "latitude", "crime_type_id", "crime_type", "number_of_crime",
+    ],
+    "fact_crime_num": [
+        "date_id", "year", "month_number", "lsoa_id", "lsoa_name", "location_id", "location",
+        "longitude", "latitude", "police_officer_strength", "police_staff_strength",
+        "pcso_strength", "crime_type_id", "crime_type", "number_of_crime",
+    ],
+}
+
+
+# ------------------ SCAN ------------------ #
+TEXT_KEYS = ["LSOA_name", "Location", "Crime_type", "Last_outcome_category"]
+CODE_KEYS = ["date_id"] + TEXT_KEYS
+
+
+def _sum_name(col):
+    return f"{col}__sum"
+
+
+def _count_name(col):
+    return f"{col}__count"
+
+
+MEASURES = ["rows"] + [f(c) for c in VALUE_COLUMNS for f in (_sum_name, _count_name)]
+
+
+class ValueEncoder:
+    """Append-only value -> provisional code dictionary shared across batches."""
+
+    def __init__(self):
+        self.values = pd.Index([], dtype=object)
+
+    def encode(self, series):
+        local, uniques = pd.factorize(series, use_na_sentinel=True)
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+        codes = self.values.get_indexer(uniques)
+        new = codes < 0
+        if new.any():
+            codes[new] = np.arange(len(self.values), len(self.values) + new.sum())
+            self.values = self.values.append(uniques[new])
+        # Null rows (local code -1) pick the trailing -1.
+        return np.append(codes, -1)[local]
+
+
+def parse_date_id(dates):
+    """YYYYMM from the staging "Date" text (split_part(trim("Date"), '-', n)), -1 if invalid."""
+    local, uniques = pd.factorize(pd.Series(dates, dtype=object), use_na_sentinel=True)
+    parts = pd.Series(uniques, dtype="string").str.strip().str.split("-", n=2, expand=True)
+    if parts.shape[1] < 2:
+        return np.full(len(local), -1, dtype=np.int64)
+    year = pd.to_numeric(parts[0], errors="coerce")
+    month = pd.to_numeric(parts[1], errors="coerce")
+    ids = (year * 100 + month).fillna(-1).astype(np.int64).to_numpy()
+    return np.append(ids, -1)[local]
+
+
+def partial_aggregate(keyed):
+    """Collapse an encoded batch to one row per key combination with sum / count per value."""
+    grouped = keyed.groupby(CODE_KEYS, sort=False)
+    sums = grouped[VALUE_COLUMNS].sum(min_count=1).rename(columns=_sum_name)
+    counts = grouped[VALUE_COLUMNS].count().rename(columns=_count_name)
+    return pd.concat([grouped.size().rename("rows"), sums, counts], axis=1)
+
+
+def combine_partials(parts):
+    return pd.concat(parts).groupby(level=CODE_KEYS, sort=False).sum(min_count=1)
+
+
+def iter_staging_batches(source, batch_rows=BATCH_ROWS):
+    """Yield DataFrames of the needed staging columns from Parquet or a DataFrame.
+
+    Parquet batches carry the file name of their staging part in ``attrs["part"]``.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), batch_rows):
+            yield source.iloc[start:start + batch_rows][STAGING_COLUMNS]
+        return
+    scanner = ds.dataset(source, format="parquet").scanner(columns=STAGING_COLUMNS, batch_size=batch_rows)
+    for tagged in scanner.scan_batches():
+        batch = tagged.record_batch.to_pandas()
+        batch.attrs["part"] = os.path.basename(tagged.fragment.path)
+        yield batch
+
+
+def scan_staging(source, batch_rows=BATCH_ROWS, combine_every=16, check=None):
+    """The single pass over staging.
+
+    ``check(batch)`` (e.g. ``data_quality.QualityCheck``) may drop rows from
+    each batch before it is encoded. Returns (grouped partial aggregates on
+    provisional codes, {column: ValueEncoder}, distinct (LSOA_name code,
+    LSOA_code) pairs).
+    """
+    encoders = {col: ValueEncoder() for col in TEXT_KEYS}
+    parts, merged, lsoa_pairs = [], None, []
+    for batch in iter_staging_batches(source, batch_rows):
+        if check is not None:
+            batch = check(batch)
+        columns = {"date_id": parse_date_id(batch["Date"])}
+        for col in TEXT_KEYS:
+            columns[col] = encoders[col].encode(batch[col])
+        for col in VALUE_COLUMNS:
+            columns[col] = batch[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        keyed = pd.DataFrame(columns)
+        parts.append(partial_aggregate(keyed))
+        lsoa_pairs.append(
+            pd.DataFrame({"code": keyed["LSOA_name"], "LSOA_code": batch["LSOA_code"].to_numpy()})
+            .drop_duplicates()
+        )
+        if len(parts) >= combine_every:
+            merged = combine_partials(parts if merged is None else [merged] + parts)
+            parts = []
+    if parts:
+        merged = combine_partials(parts if merged is None else [merged] + parts)
+    if merged is None:
+        raise ValueError(f"No staging rows found in {source!r}")
+    return merged.reset_index(), encoders, pd.concat(lsoa_pairs).drop_duplicates()
+
+
+# ------------------ DIMENSIONS ------------------ #
+# (staging column, dimension table, surrogate key, label column, skip blank labels)
+DIMENSIONS = [
+    ("Last_outcome_category", "dim_outcome", "outcome_id", "last_outcome_category", True),
+    ("Location", "dim_location", "location_id", "location", True),
+    ("LSOA_name", "dim_lsoaname", "lsoa_id", "lsoa_name", False),
+    ("Crime_type", "dim_crime_type", "crime_type_id", "crime_type", False),
+]
+
+
+def build_dim_date(years=DATE_RANGE):
+    rows = []
+    for y in range(years[0], years[1] + 1):
+        for m in range(1, 13):
+            rows.append({
+                "date_id": y * 100 + m,
+                "year": y,
+                "month_number": m,
+                "year_month": f"{y}-{m:02d}",
+                # to_char(..., 'Month') blank-pads month names to 9 characters.
+                "month_name": f"{calendar.month_name[m]:<9}",
+                "quarter": (m - 1) // 3 + 1,
+            })
+    return pd.DataFrame(rows)
+
+
+def _dimension(encoder, key, label, skip_blank, existing=None):
+    """Dimension over the encoder's values plus a provisional-code -> id remap.
+
+    Members already in ``existing`` keep their id; new members are sorted and
+    numbered after the current maximum (from 1 on a fresh build). The remap
+    has one extra trailing slot so code -1 (null) maps to -1.
+    """
+    if existing is None:
+        existing = pd.DataFrame({key: pd.Series(dtype=np.int64), label: pd.Series(dtype=object)})
+    values = pd.Series(encoder.values, dtype=object)
+    keep = values.notna().to_numpy()
+    if skip_blank:
+        keep = keep & (values.astype(str).str.strip() != "").to_numpy()
+    members = values[keep].to_numpy(dtype=object)
+
+    found = pd.Index(existing[label]).get_indexer(members)
+    ids = np.append(existing[key].to_numpy(dtype=np.int64), -1)[found]
+    fresh = np.flatnonzero(ids < 0)
+    fresh = fresh[np.argsort(members[fresh], kind="stable")]
+    start = int(existing[key].max()) + 1 if len(existing) else 1
+    ids[fresh] = np.arange(start, start + len(fresh))
+
+    remap = np.full(len(values) + 1, -1, dtype=np.int64)
+    remap[np.flatnonzero(keep)] = ids
+    added = pd.DataFrame({key: ids[fresh], label: members[fresh]})
+    dim = pd.concat([existing, added], ignore_index=True) if len(existing) else added
+    return dim, remap
+
+
+def build_dimensions(encoders, lsoa_pairs, existing=None):
+    """dim_* tables following the SQL filters, and the code -> surrogate key remaps.
+
+    ``existing`` ({dim_name: df}) makes surrogate ids stable across incremental loads.
+    """
+    existing = existing or {}
+    dims, remaps = {"dim_date": build_dim_date()}, {}
+    for col, name, key, label, skip_blank in DIMENSIONS:
+        dims[name], remaps[col] = _dimension(encoders[col], key, label, skip_blank, existing.get(name))
+
+    # lsoa_name is UNIQUE in the DDL: keep one (lowest) code per name.
+    pairs = lsoa_pairs.assign(lsoa_id=remaps["LSOA_name"][lsoa_pairs["code"].to_numpy()])
+    codes = (
+        pairs[pairs["lsoa_id"] > 0]
+        .sort_values(["lsoa_id", "LSOA_code"], na_position="last")
+        .drop_duplicates("lsoa_id")
+        .set_index("lsoa_id")["LSOA_code"]
+    )
+    lsoa = dims["dim_lsoaname"]
+    scanned = codes.reindex(lsoa["lsoa_id"]).to_numpy()
+    if "lsoa_code" in lsoa.columns:
+        # Known members keep the code they were loaded with.
+        scanned = lsoa["lsoa_code"].where(lsoa["lsoa_code"].notna(), scanned).to_numpy()
+    lsoa["lsoa_code"] = scanned
+    return dims, remaps
+
+
+def dimension_labels(dim, key, label, ids):
+    """Labels for surrogate keys by array lookup."""
+    lookup = np.empty(dim[key].max() + 1 if len(dim) else 1, dtype=object)
+    lookup[dim[key].to_numpy()] = dim[label].to_numpy()
+    return lookup[ids]
+
+
+# ------------------ FACTS ------------------ #
+def shared_aggregate(grouped, dims, remaps):
+    """Assign surrogate keys and aggregate once at the (fact keys, outcome) grain."""
+    keyed = pd.DataFrame({
+        "date_id": grouped["date_id"].to_numpy(),
+        "lsoa_id": remaps["LSOA_name"][grouped["LSOA_name"].to_numpy()],
+        "location_id": remaps["Location"][grouped["Location"].to_numpy()],
+        "crime_type_id": remaps["Crime_type"][grouped["Crime_type"].to_numpy()],
+        "outcome_id": remaps["Last_outcome_category"][grouped["Last_outcome_category"].to_numpy()],
+        **{col: grouped[col].to_numpy() for col in MEASURES},
+    })
+
+    # Inner joins to dim_lsoaname / dim_location / dim_crime_type / dim_date.
+    valid = (keyed[FACT_KEYS[1:]] > 0).all(axis=1) & keyed["date_id"].isin(dims["dim_date"]["date_id"])
+    keyed = keyed[valid]
+    return keyed.groupby(FACT_KEYS + ["outcome_id"], sort=True)[MEASURES].sum(min_count=1).reset_index()
+
+
+def _mean(agg, col):
+    counts = agg[_count_name(col)].to_numpy(dtype=np.float64)
+    sums = agg[_sum_name(col)].to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _finish_fact(agg, dims, count_name, with_outcome):
+    out = pd.DataFrame({key: agg[key].to_numpy() for key in FACT_KEYS})
+    out["year"] = out["date_id"] // 100
+    out["month_number"] = out["date_id"] % 100
+    out["lsoa_name"] = dimension_labels(dims["dim_lsoaname"], "lsoa_id", "lsoa_name", out["lsoa_id"])
+    out["location"] = dimension_labels(dims["dim_location"], "location_id", "location", out["location_id"])
+    out["crime_type"] = dimension_labels(
+        dims["dim_crime_type"], "crime_type_id", "crime_type", out["crime_type_id"]
+    )
+    if with_outcome:
+        out["outcome_id"] = agg["outcome_id"].to_numpy()
+        out["last_outcome_category"] = dimension_labels(
+            dims["dim_outcome"], "outcome_id", "last_outcome_category", out["outcome_id"]
+        )
+    out["longitude"] = _mean(agg, "Longitude")
+    out["latitude"] = _mean(agg, "Latitude")
+    for src, dst in STRENGTHS.items():
+        # AVG(double precision)::INT rounds half to even.
+        out[dst] = pd.array(np.rint(_mean(agg, src)), dtype="Float64").astype("Int64")
+    out[count_name] = agg["rows"].to_numpy()
+    return out
+
+
+def build_facts(shared, dims):
+    """All four fact tables from the shared aggregation."""
+    per_crime = shared.groupby(FACT_KEYS, sort=True)[MEASURES].sum(min_count=1).reset_index()
+    resolved = shared[shared["outcome_id"] > 0]
+    crime = _finish_fact(per_crime, dims, "number_of_crime", with_outcome=False)
+    facts = {
+        "fact_occuring_time": crime.rename(columns={"number_of_crime": "number_of_crime_occuring"}),
+        "fact_resolution": _finish_fact(resolved, dims, "number_of_resolution", with_outcome=True),
+        "fact_crime_count": crime,
+        "fact_crime_num": crime,
+    }
+    return {name: df[FACT_COLUMNS[name]] for name, df in facts.items()}
+
+
+def build_warehouse(source, batch_rows=BATCH_ROWS, check=None):
+    """Scan staging once and return ({dim_name: df}, {fact_name: df})."""
+    grouped, encoders, lsoa_pairs = scan_staging(source, batch_rows, check=check)
+    dims, remaps = build_dimensions(encoders, lsoa_pairs)
+    facts = build_facts(shared_aggregate(grouped, dims, remaps), dims)
+    return dims, facts
+
+
+def write_tables(tables, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, df in tables.items():
+        tmp = os.path.join(out_dir, f".{name}.csv.tmp")
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, os.path.join(out_dir, f"{name}.csv"))
+
+
+# ------------------ SQL REFERENCE (BENCHMARK) ------------------ #
+def sql_reference_fact(staging, dims, name):
+    """pandas port of one INSERT ... SELECT from the SQL script: its own full scan."""
+    cd = staging.copy()
+    date = cd["Date"].astype("string").str.strip().str.split("-", n=2, expand=True)
+    cd["date_id"] = pd.to_numeric(date[0], errors="coerce") * 100 + pd.to_numeric(date[1], errors="coerce")
+    cd = cd.merge(dims["dim_lsoaname"][["lsoa_id", "lsoa_name"]], left_on="LSOA_name", right_on="lsoa_name")
+    cd = cd.merge(dims["dim_location"], left_on="Location", right_on="location")
+    cd = cd.merge(dims["dim_crime_type"], left_on="Crime_type", right_on="crime_type")
+    cd = cd[cd["date_id"].isin(dims["dim_date"]["date_id"])]
+    keys = FACT_KEYS + ["lsoa_name", "location", "crime_type"]
+    aggs = {"longitude": ("Longitude", "mean"), "latitude": ("Latitude", "mean"), "rows": ("Date", "size")}
+    if name == "fact_resolution":
+        cd = cd.merge(dims["dim_outcome"], left_on="Last_outcome_category", right_on="last_outcome_category")
+        keys += ["outcome_id", "last_outcome_category"]
+    if name in ("fact_resolution", "fact_crime_num"):
+        aggs.update({dst: (src, "mean") for src, dst in STRENGTHS.items()})
+    out = cd.groupby(keys, sort=True).agg(**aggs).reset_index()
+    for dst in STRENGTHS.values():
+        if dst in out.columns:
+            out[dst] = pd.array(np.rint(out[dst]), dtype="Float64").astype("Int64")
+    out["year"] = out["date_id"] // 100
+    out["month_number"] = out["date_id"] % 100
+    count_name = [c for c in FACT_COLUMNS[name] if c.startswith("number_of_")][0]
+    return out.rename(columns={"rows": count_name})[FACT_COLUMNS[name]]
+
+
+def facts_match(a, b):
+    """Same rows regardless of order (floats compared with a tolerance)."""
+    keys = [c for c in a.columns if c.endswith("_id")]
+    a = a.sort_values(keys).reset_index(drop=True)
+    b = b.sort_values(keys).reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(a, b, check_dtype=False, rtol=1e-9)
+    except AssertionError:
+        return False
+    return True
+
+
+def benchmark(source, batch_rows=BATCH_ROWS):
+    """Time the single-pass build against the four-scan SQL port; returns a report dict."""
+    started = time.perf_counter()
+    dims, facts = build_warehouse(source, batch_rows)
+    single = time.perf_counter() - started
+
+    staging = source if isinstance(source, pd.DataFrame) else pq.read_table(
+        source, columns=STAGING_COLUMNS
+    ).to_pandas()
+    started = time.perf_counter()
+    reference = {name: sql_reference_fact(staging, dims, name) for name in FACT_COLUMNS}
+    four_scan = time.perf_counter() - started
+
+    return {
+        "staging_rows": len(staging),
+        "single_pass_s": round(single, 3),
+        "four_scan_sql_port_s": round(four_scan, 3),
+        "speedup": round(four_scan / single, 2) if single else None,
+        "fact_rows": {name: len(df) for name, df in facts.items()},
+        "outputs_match": {name: facts_match(facts[name], reference[name]) for name in FACT_COLUMNS},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build warehouse dims and facts from staging in one pass.")
+    parser.add_argument("staging", help="Parquet staging folder written by crime_etl.py")
+    parser.add_argument("--out", default=".", help="Folder for fact_*.csv and dim_*.csv")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--benchmark", action="store_true", help="Compare with the four-scan SQL port")
+    parser.add_argument("--star", action="store_true", help="Write key-only facts (labels stay in dim_*.csv)")
+    parser.add_argument(
+        "--no-quality", action="store_true", help="Skip the data-quality checks, report and quarantine"
+    )
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        print(json.dumps(benchmark(args.staging, args.batch_rows), indent=2))
+        return 0
+
+    check = None
+    if not args.no_quality:
+        # Imported here: data_quality builds on this module.
+        from data_quality import QUARANTINE_NAME, QualityCheck, write_report
+        os.makedirs(args.out, exist_ok=True)
+        check = QualityCheck(os.path.join(args.out, QUARANTINE_NAME))
+    try:
+        dims, facts = build_warehouse(args.staging, args.batch_rows, check)
+    finally:
+        if check is not None:
+            check.close()
+    if args.star:
+        facts = {name: key_only(df) for name, df in facts.items()}
+    write_tables({**dims, **facts}, args.out)
+    for name, df in {**dims, **facts}.items():
+        print(f"{name}: {len(df):,} rows")
+    if check is not None:
+        report = check.report(args.staging)
+        write_report(report, args.out)
+        print(f"Quality: {report['rows_rejected']:,} of {report['rows_checked']:,} staging rows quarantined")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
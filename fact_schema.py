@@ -0,0 +1,264 @@
+"""Explicit in-memory schemas for the four fact tables.
+
+Column types follow the DDL in ``Crime_df_warehouse_code.sql`` but are sized
+for the dashboard: surrogate keys and counts as int32, year/month as int16,
+coordinates as float32 and the denormalised text dimensions as categoricals
+that are shared across tables by ``share_categories``.
+
+Run ``python fact_schema.py fact_crime_count.csv ...`` for a memory report
+comparing a plain ``pd.read_csv`` with the typed frames.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# ------------------ SCHEMAS ------------------ #
+_DATE_COLUMNS = {
+    "date_id": "int32",
+    "year": "int16",
+    "month_number": "int16",
+}
+
+_PLACE_COLUMNS = {
+    "lsoa_id": "int32",
+    "lsoa_name": "category",
+    "location_id": "int32",
+    "location": "category",
+    "longitude": "float32",
+    "latitude": "float32",
+}
+
+_STRENGTH_COLUMNS = {
+    "police_officer_strength": "int32",
+    "police_staff_strength": "int32",
+    "pcso_strength": "int32",
+}
+
+_CRIME_TYPE_COLUMNS = {
+    "crime_type_id": "int32",
+    "crime_type": "category",
+}
+
+FACT_SCHEMAS = {
+    "fact_crime_count": {
+        **_DATE_COLUMNS,
+        **_PLACE_COLUMNS,
+        **_CRIME_TYPE_COLUMNS,
+        "number_of_crime": "int32",
+    },
+    "fact_crime_num": {
+        **_DATE_COLUMNS,
+        **_PLACE_COLUMNS,
+        **_STRENGTH_COLUMNS,
+        **_CRIME_TYPE_COLUMNS,
+        "number_of_crime": "int32",
+    },
+    "fact_occuring_time": {
+        **_DATE_COLUMNS,
+        **_PLACE_COLUMNS,
+        **_CRIME_TYPE_COLUMNS,
+        "number_of_crime_occuring": "int32",
+    },
+    "fact_resolution": {
+        **_DATE_COLUMNS,
+        **_PLACE_COLUMNS,
+        **_STRENGTH_COLUMNS,
+        **_CRIME_TYPE_COLUMNS,
+        "outcome_id": "int32",
+        "last_outcome_category": "category",
+        "number_of_resolution": "int32",
+    },
+}
+
+# Dimension tables loaded next to key-only facts (see star_schema.py).
+DIM_SCHEMAS = {
+    "dim_lsoaname": {"lsoa_id": "int32", "lsoa_name": "category", "lsoa_code": "category"},
+    "dim_location": {"location_id": "int32", "location": "category"},
+    "dim_crime_type": {"crime_type_id": "int32", "crime_type": "category"},
+    "dim_outcome": {"outcome_id": "int32", "last_outcome_category": "category"},
+}
+
+TABLE_SCHEMAS = {**FACT_SCHEMAS, **DIM_SCHEMAS}
+
+# Text dimensions whose categories are unified across the loaded tables.
+SHARED_CATEGORICALS = ["lsoa_name", "location", "crime_type", "last_outcome_category", "year_month"]
+
+
+# ------------------ CASTING ------------------ #
+def csv_dtypes(table):
+    """dtype mapping for ``pd.read_csv`` (text straight to category, floats narrowed)."""
+    schema = TABLE_SCHEMAS.get(table, {})
+    return {col: t for col, t in schema.items() if t == "category" or t.startswith("float")}
+
+
+def _cast(series, dtype):
+    if dtype == "category":
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    if dtype.startswith("int") and series.isna().any():
+        # AVG(...)::INT over a left join can be NULL – keep the column nullable.
+        return series.astype(dtype.capitalize())
+    return series.astype(dtype)
+
+
+def year_month_from_date_id(date_id):
+    """Vectorised ``YYYY-MM`` categorical from a YYYYMM integer key."""
+    uniques, codes = np.unique(np.asarray(date_id), return_inverse=True)
+    labels = [f"{d // 100}-{d % 100:02d}" for d in uniques.tolist()]
+    return pd.Categorical.from_codes(codes.astype("int32"), categories=labels)
+
+
+def apply_schema(df, table):
+    """Cast ``df`` in place to the schema for ``table`` and derive ``year_month``."""
+    schema = TABLE_SCHEMAS.get(table, {})
+    for col, dtype in schema.items():
+        if col in df.columns:
+            df[col] = _cast(df[col], dtype)
+    if table in DIM_SCHEMAS:
+        return df
+
+    if "date_id" not in df.columns and {"year", "month_number"}.issubset(df.columns):
+        df["date_id"] = (df["year"].astype("int32") * 100 + df["month_number"]).astype("int32")
+    elif "date_id" in df.columns and "year" not in df.columns:
+        # Key-only facts carry date_id alone.
+        df["year"] = (df["date_id"] // 100).astype("int16")
+        df["month_number"] = (df["date_id"] % 100).astype("int16")
+
+    if "date_id" in df.columns:
+        df["year_month"] = year_month_from_date_id(df["date_id"])
+    else:
+        df["year_month"] = pd.Categorical(["Unknown"] * len(df))
+    return df
+
+
+def share_categories(frames):
+    """Give every frame the same CategoricalDtype object per text dimension.
+
+    Categories are the sorted union across frames. When a frame already holds
+    exactly that set only its codes are re-wrapped, so no strings are rehashed.
+    """
+    frames = [df for df in frames if df is not None]
+    for col in SHARED_CATEGORICALS:
+        holders = [df for df in frames if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype)]
+        if len(holders) < 2:
+            continue
+        union = holders[0][col].cat.categories
+        for df in holders[1:]:
+            union = union.union(df[col].cat.categories)
+        shared = pd.CategoricalDtype(union.sort_values())
+        for df in holders:
+            current = df[col].cat.categories
+            if current.equals(shared.categories):
+                df[col] = pd.Categorical.from_codes(df[col].cat.codes, dtype=shared)
+            else:
+                df[col] = df[col].cat.set_categories(shared.categories).astype(shared)
+    return frames
+
+
+# ------------------ VALIDATION ------------------ #
+VALIDATION_SAMPLE_ROWS = 1_000
+
+
+class SchemaMismatch(ValueError):
+    """A source file does not match the schema of the fact table it is loaded as."""
+
+
+def required_columns(table):
+    """Columns a file for ``table`` must carry: keys, coordinates and measures.
+
+    Label columns are optional (key-only facts take them from the dim_*
+    tables) and ``year`` / ``month_number`` can be derived from ``date_id``.
+    """
+    schema = TABLE_SCHEMAS.get(table, {})
+    optional = {"date_id", "year", "month_number"} if table in FACT_SCHEMAS else set()
+    return [col for col, t in schema.items() if t != "category" and col not in optional]
+
+
+def validate_sample(sample, table, name=None):
+    """Raise ``SchemaMismatch`` unless ``sample`` has the columns and types of ``table``."""
+    name = name or table
+    columns = set(sample.columns)
+    missing = [col for col in required_columns(table) if col not in columns]
+    if table in FACT_SCHEMAS and "date_id" not in columns and not {"year", "month_number"} <= columns:
+        missing.insert(0, "date_id (or year + month_number)")
+    if missing:
+        raise SchemaMismatch(f"{name} is not a valid {table} file: missing column(s) {', '.join(missing)}.")
+    try:
+        apply_schema(sample.copy(), table)
+    except (ValueError, TypeError) as e:
+        raise SchemaMismatch(f"{name} does not match the {table} schema: {e}") from e
+
+
+def validate_source(path_or_file, table, sample_rows=VALIDATION_SAMPLE_ROWS):
+    """Check the header and first ``sample_rows`` rows of a CSV before it is fully parsed."""
+    if isinstance(path_or_file, (str, os.PathLike)):
+        name = os.path.basename(path_or_file)
+    else:
+        name = getattr(path_or_file, "name", None) or "uploaded file"
+    try:
+        sample = pd.read_csv(path_or_file, nrows=sample_rows, dtype=csv_dtypes(table))
+    except ValueError as e:  # ParserError, EmptyDataError, bad dtype
+        raise SchemaMismatch(f"{name} could not be read as CSV: {e}") from e
+    finally:
+        if hasattr(path_or_file, "seek"):
+            path_or_file.seek(0)
+    validate_sample(sample, table, name)
+
+
+# ------------------ MEMORY REPORT ------------------ #
+def table_from_path(path):
+    """Guess the fact table name from a file name such as ``fact_resolution.csv``."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem if stem in TABLE_SCHEMAS else None
+
+
+def memory_report(before, after):
+    """Per-table deep memory usage (MB) of two {table: DataFrame} mappings."""
+    rows = []
+    for table, df_before in before.items():
+        df_after = after[table]
+        mb_before = df_before.memory_usage(deep=True).sum() / 1e6
+        mb_after = df_after.memory_usage(deep=True).sum() / 1e6
+        rows.append({
+            "table": table,
+            "rows": len(df_before),
+            "before_mb": round(mb_before, 2),
+            "after_mb": round(mb_after, 2),
+            "saving_pct": round(100 * (1 - mb_after / mb_before), 1) if mb_before else 0.0,
+        })
+    report = pd.DataFrame(rows)
+    if not report.empty:
+        total = report[["rows", "before_mb", "after_mb"]].sum()
+        report.loc[len(report)] = {
+            "table": "TOTAL",
+            "rows": int(total["rows"]),
+            "before_mb": round(total["before_mb"], 2),
+            "after_mb": round(total["after_mb"], 2),
+            "saving_pct": round(100 * (1 - total["after_mb"] / total["before_mb"]), 1),
+        }
+    return report
+
+
+def _legacy_load(path):
+    # Mirrors the original load_csv: default dtypes plus a string year_month.
+    df = pd.read_csv(path)
+    if {"year", "month_number"}.issubset(df.columns):
+        df["year_month"] = (
+            df["year"].astype(str) + "-" + df["month_number"].astype(str).str.zfill(2)
+        )
+    return df
+
+
+def main(paths):
+    before, after = {}, {}
+    for path in paths:
+        table = table_from_path(path) or path
+        before[table] = _legacy_load(path)
+        after[table] = apply_schema(pd.read_csv(path, dtype=csv_dtypes(table)), table)
+    share_categories(list(after.values()))
+    print(memory_report(before, after).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,88 @@
+"""Process-wide, read-only store of the default fact tables.
+
+Every Streamlit session gets the *same* DataFrame objects from the store
+instead of a pickled copy per call, so memory no longer grows with the
+number of users and reruns pay no deserialisation. Frames are treated as
+immutable and rely on pandas Copy-on-Write: a session that modifies a
+"copy" only ever touches its own lazily copied data.
+
+On each access the source file is stat-ed. When size or mtime changed the
+table is reloaded off to the side and the published mapping is swapped in a
+single assignment, so a session sees either the old or the new version,
+never a partially loaded one. Different tables load concurrently (one lock
+per path); only publishing the new mapping is serialised.
+"""
+import os
+import threading
+
+from fact_schema import share_categories
+
+
+def source_signature(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+class FactStore:
+    """Shared {path: DataFrame} with atomic reload on source change."""
+
+    def __init__(self, loader, on_reload=None):
+        # loader(path, table) -> DataFrame carrying attrs["fingerprint"]
+        # on_reload(path, stale fingerprint, fresh fingerprint)
+        self._loader = loader
+        self._on_reload = on_reload
+        self._lock = threading.Lock()
+        self._path_locks = {}
+        self._published = {}  # path -> (signature, table, DataFrame)
+
+    def _path_lock(self, path):
+        with self._lock:
+            return self._path_locks.setdefault(path, threading.Lock())
+
+    def is_current(self, path):
+        """True when ``path`` is loaded and its file has not changed since."""
+        entry = self._published.get(path)
+        try:
+            return entry is not None and entry[0] == source_signature(path)
+        except OSError:
+            return False
+
+    def get(self, path, table):
+        """Shared frame for ``path``, reloading it first if the file changed."""
+        sig = source_signature(path)
+        entry = self._published.get(path)
+        if entry is not None and entry[0] == sig:
+            return entry[2]
+
+        with self._path_lock(path):
+            entry = self._published.get(path)
+            if entry is not None and entry[0] == sig:
+                return entry[2]
+            df = self._loader(path, table)
+            stale = entry[2].attrs.get("fingerprint") if entry is not None else None
+            with self._lock:
+                self._publish(path, sig, table, df)
+
+        fresh = df.attrs.get("fingerprint")
+        if self._on_reload is not None and stale and stale != fresh:
+            self._on_reload(path, stale, fresh)
+        return self._published[path][2]
+
+    def _publish(self, path, sig, table, df):
+        # Re-point the other tables at the unified categories on shallow copies
+        # so frames already handed out to running sessions are left untouched.
+        published = {
+            p: (s, t, frame.copy(deep=False))
+            for p, (s, t, frame) in self._published.items()
+            if p != path
+        }
+        published[path] = (sig, table, df)
+        share_categories([frame for _, _, frame in published.values()])
+        self._published = published
+
+    def tables(self):
+        """Snapshot of {path: (table, rows, fingerprint)} for diagnostics."""
+        return {
+            p: (t, len(frame), frame.attrs.get("fingerprint"))
+            for p, (_, t, frame) in self._published.items()
+        }
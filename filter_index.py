@@ -0,0 +1,110 @@
+"""Inverted index over the sidebar filter columns of a fact table.
+
+Built once per loaded table. For every filter column it keeps the per-row
+value codes and a position list per distinct value (a stable argsort split
+by value), plus the sorted option list shown in the widget. A selection is
+answered by starting from the smallest selected position list and probing
+the other columns' codes, so the cost scales with the matching rows rather
+than the table size and the frame is never copied as a whole.
+"""
+import numpy as np
+import pandas as pd
+
+FILTER_COLUMNS = ["year", "month_number", "lsoa_id", "crime_type_id"]
+
+
+class _ColumnIndex:
+    def __init__(self, series):
+        # factorize works off the codes for categoricals, so this stays cheap.
+        codes, values = pd.factorize(series, sort=True, use_na_sentinel=True)
+        self.codes = codes.astype(np.int32, copy=False)
+        self.values = values.tolist()
+        self._lookup = {v: i for i, v in enumerate(self.values)}
+
+        valid = self.codes >= 0
+        counts = np.bincount(self.codes[valid], minlength=len(self.values))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        # Rows grouped by code, ascending row order inside each group.
+        self.order = np.argsort(np.where(valid, self.codes, len(self.values)), kind="stable")
+        self.order = self.order[: self.offsets[-1]].astype(np.int32)
+
+    def codes_for(self, values):
+        return np.array(
+            sorted({self._lookup[v] for v in values if v in self._lookup}), dtype=np.int32
+        )
+
+    def size_of(self, codes):
+        return int((self.offsets[codes + 1] - self.offsets[codes]).sum())
+
+    def positions_for(self, codes):
+        parts = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in codes]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int32)
+
+    def mask_for(self, codes):
+        lut = np.zeros(len(self.values) + 1, dtype=bool)
+        lut[codes] = True
+        return lut
+
+
+class FilterIndex:
+    """Per-value row positions and cached options for the filter columns."""
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.n_rows = len(df)
+        self._columns = {col: _ColumnIndex(df[col]) for col in columns if col in df.columns}
+
+    def __contains__(self, col):
+        return col in self._columns
+
+    def options(self, col, selection=None):
+        """Sorted distinct non-null values of ``col`` (among the rows matching ``selection``)."""
+        index = self._columns[col]
+        positions = self.positions(selection or {})
+        if positions is None:
+            return index.values
+        present = np.bincount(index.codes[positions] + 1, minlength=len(index.values) + 1)[1:]
+        return [index.values[c] for c in np.flatnonzero(present)]
+
+    def normalise(self, selection):
+        """Drop inactive filters (empty, or every option selected) and sort values."""
+        active = {}
+        for col, values in selection.items():
+            if col not in self._columns or not values:
+                continue
+            index = self._columns[col]
+            codes = index.codes_for(values)
+            if len(codes) == len(index.values):
+                continue
+            active[col] = tuple(index.values[c] for c in codes)
+        return active
+
+    def positions(self, selection):
+        """Row positions matching ``selection``, or None when no filter is active."""
+        active = self.normalise(selection)
+        if not active:
+            return None
+
+        plans = []
+        for col, values in active.items():
+            index = self._columns[col]
+            codes = index.codes_for(values)
+            plans.append((index.size_of(codes), index, codes))
+        plans.sort(key=lambda p: p[0])
+
+        _, first, first_codes = plans[0]
+        pos = first.positions_for(first_codes)
+        for _, index, codes in plans[1:]:
+            if len(pos) == 0:
+                break
+            # Null rows (code -1) land on the trailing False slot of the lookup.
+            pos = pos[index.mask_for(codes)[index.codes[pos]]]
+        return pos
+
+    def apply(self, df, selection):
+        """Return ``df`` itself when unfiltered, otherwise only the matching rows."""
+        pos = self.positions(selection)
+        if pos is None:
+            return df
+        return df.take(pos)
@@ -0,0 +1,266 @@
+"""Incremental monthly ingestion into the staging parts and the fact tables.
+
+A manifest in the warehouse folder records every raw police CSV already
+ingested (path, content hash, months it covers, staging part). On each run
+only new or changed files are staged with ``crime_etl.process_file``; the
+months they touch are re-aggregated from the staging parts that cover them
+and upserted into the fact CSVs by primary key, leaving every other month
+as it was. Dimension members keep their surrogate ids across runs and new
+members are numbered after the current maximum.
+
+The manifest also records which months the last run replaced and the fact
+files' hashes before and after, so the dashboard can drop only the cached
+results that read those months.
+
+The rescanned staging parts go through the same ``data_quality`` checks as a
+full build, so the refreshed months get the same facts; the quality report
+and quarantine are updated for those parts (``--no-quality`` skips this).
+
+Usage::
+
+    python incremental_load.py CRIME_CSV_DIR POLICE_STRENGTH.csv --staging crime_df_staging --warehouse .
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import crime_etl
+from columnar_cache import content_hash, file_signature
+from data_quality import QUARANTINE_NAME, REPORT_NAME, QualityCheck, read_report, write_report
+from fact_builder import (
+    BATCH_ROWS,
+    DIMENSIONS,
+    FACT_COLUMNS,
+    FACT_KEYS,
+    build_dimensions,
+    build_facts,
+    parse_date_id,
+    scan_staging,
+    shared_aggregate,
+    write_tables,
+)
+
+# ------------------ SETTINGS ------------------ #
+MANIFEST_NAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+# Primary key of each fact table, as in the DDL.
+FACT_PRIMARY_KEYS = {
+    name: FACT_KEYS + (["outcome_id"] if "outcome_id" in columns else [])
+    for name, columns in FACT_COLUMNS.items()
+}
+FACT_INT_COLUMNS = [
+    "date_id", "year", "month_number", "lsoa_id", "location_id", "crime_type_id", "outcome_id",
+    "police_officer_strength", "police_staff_strength", "pcso_strength",
+    "number_of_crime", "number_of_crime_occuring", "number_of_resolution",
+]
+
+
+# ------------------ MANIFEST ------------------ #
+def manifest_path(warehouse_dir):
+    return os.path.join(warehouse_dir, MANIFEST_NAME)
+
+
+def load_manifest(warehouse_dir):
+    try:
+        with open(manifest_path(warehouse_dir), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "files": {}, "last_run": None}
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in {manifest_path(warehouse_dir)!r}")
+    return manifest
+
+
+def save_manifest(warehouse_dir, manifest):
+    path = manifest_path(warehouse_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def pending_sources(sources, manifest):
+    """Sources that are new or whose contents changed since they were ingested."""
+    pending = []
+    for path in sources:
+        sig = file_signature(path)
+        entry = manifest["files"].get(sig["path"])
+        if entry is not None and (entry["size"], entry["mtime_ns"]) == (sig["size"], sig["mtime_ns"]):
+            continue
+        digest = content_hash(path)
+        if entry is not None and entry["hash"] == digest:
+            # Touched but identical: just refresh the stat fields.
+            entry.update(size=sig["size"], mtime_ns=sig["mtime_ns"])
+            continue
+        pending.append((path, sig, digest))
+    return pending
+
+
+def part_months(part):
+    """Sorted date_ids present in one staging part."""
+    dates = pq.read_table(part, columns=["Date"]).column("Date").to_pandas()
+    ids = pd.unique(parse_date_id(dates))
+    return sorted(int(i) for i in ids if i > 0)
+
+
+def refreshed_months(fact_path, stale_digest, fresh_digest):
+    """date_ids the last run replaced in ``fact_path``, if that run explains the change.
+
+    Returns None when the file changed in any other way (e.g. a full rebuild),
+    so callers fall back to treating every month as changed.
+    """
+    try:
+        manifest = load_manifest(os.path.dirname(os.path.abspath(fact_path)))
+    except ValueError:
+        return None
+    last = manifest.get("last_run") or {}
+    output = last.get("outputs", {}).get(os.path.basename(fact_path))
+    if output and output.get("previous_hash") == stale_digest and output.get("hash") == fresh_digest:
+        return last["date_ids"]
+    return None
+
+
+# ------------------ WAREHOUSE IO ------------------ #
+def read_dimensions(warehouse_dir):
+    """Existing dim_*.csv tables (labels kept verbatim), or {} on a first load."""
+    dims = {}
+    for _, name, key, label, _ in DIMENSIONS:
+        path = os.path.join(warehouse_dir, f"{name}.csv")
+        if os.path.exists(path):
+            dim = pd.read_csv(path, dtype=object, keep_default_na=False)
+            dim[key] = dim[key].astype("int64")
+            if "lsoa_code" in dim.columns:
+                dim["lsoa_code"] = dim["lsoa_code"].replace("", None)
+            dims[name] = dim
+    return dims
+
+
+def read_fact(warehouse_dir, name):
+    path = os.path.join(warehouse_dir, f"{name}.csv")
+    if not os.path.exists(path):
+        return None
+    columns = FACT_COLUMNS[name]
+    ints = [c for c in columns if c in FACT_INT_COLUMNS]
+    return pd.read_csv(
+        path,
+        dtype={c: ("Int64" if c in ints else "float64" if c in ("longitude", "latitude") else object)
+               for c in columns},
+        keep_default_na=False,
+        na_values={c: [""] for c in ints + ["longitude", "latitude"]},
+    )
+
+
+def upsert_fact(existing, fresh, name, months):
+    """Merge freshly aggregated rows for ``months`` into ``existing`` by primary key.
+
+    Rows whose key is in ``fresh`` are replaced and new keys are inserted.
+    Because ``fresh`` is a complete re-aggregation of those months, keys of
+    a refreshed month that no longer occur are deleted.
+    """
+    if existing is None:
+        merged = fresh
+    else:
+        kept = existing[~existing["date_id"].isin(months)]
+        merged = pd.concat([kept, fresh.astype(kept.dtypes.to_dict())], ignore_index=True)
+    return merged.sort_values(FACT_PRIMARY_KEYS[name], kind="stable").reset_index(drop=True)
+
+
+# ------------------ PIPELINE ------------------ #
+def run(crime_dir, police_path, staging_dir, warehouse_dir, batch_rows=BATCH_ROWS, quality=True, log=print):
+    """Ingest new / changed monthly CSVs; returns the sorted list of refreshed date_ids."""
+    sources = crime_etl.list_sources(crime_dir)
+    if not sources:
+        raise FileNotFoundError(f"No CSV files found in {crime_dir!r}")
+    os.makedirs(staging_dir, exist_ok=True)
+    os.makedirs(warehouse_dir, exist_ok=True)
+
+    manifest = load_manifest(warehouse_dir)
+    pending = pending_sources(sources, manifest)
+    if not pending:
+        save_manifest(warehouse_dir, manifest)
+        log("Nothing to ingest: every source file is already in the manifest.")
+        return []
+
+    police = crime_etl.load_police_strength(police_path)
+    affected = set()
+    for path, sig, digest in pending:
+        stats = crime_etl.process_file(path, police, staging_dir)
+        previous = manifest["files"].get(sig["path"])
+        if previous is not None:
+            affected.update(previous["months"])
+        months = part_months(stats["part"])
+        affected.update(months)
+        manifest["files"][sig["path"]] = {
+            "size": sig["size"],
+            "mtime_ns": sig["mtime_ns"],
+            "hash": digest,
+            "months": months,
+            "rows": stats["rows_written"],
+            "part": stats["part"],
+        }
+        log(f"{os.path.basename(path)}: {stats['rows_written']:,} rows staged ({'changed' if previous else 'new'})")
+    months = sorted(affected)
+
+    # Every staging part that holds rows for a refreshed month.
+    parts = sorted(
+        entry["part"] for entry in manifest["files"].values() if affected.intersection(entry["months"])
+    )
+    check = None
+    if quality:
+        check = QualityCheck(
+            os.path.join(warehouse_dir, QUARANTINE_NAME),
+            previous=read_report(os.path.join(warehouse_dir, REPORT_NAME)),
+            rechecked=[os.path.basename(part) for part in parts],
+        )
+    try:
+        grouped, encoders, lsoa_pairs = scan_staging(parts, batch_rows, check=check)
+    finally:
+        if check is not None:
+            check.close()
+    grouped = grouped[grouped["date_id"].isin(months)]
+    dims, remaps = build_dimensions(encoders, lsoa_pairs, existing=read_dimensions(warehouse_dir))
+    fresh = build_facts(shared_aggregate(grouped, dims, remaps), dims)
+
+    facts, outputs = {}, {}
+    for name, rows in fresh.items():
+        path = os.path.join(warehouse_dir, f"{name}.csv")
+        before = content_hash(path) if os.path.exists(path) else None
+        facts[name] = upsert_fact(read_fact(warehouse_dir, name), rows, name, months)
+        outputs[f"{name}.csv"] = {"previous_hash": before}
+    write_tables({**dims, **facts}, warehouse_dir)
+    for name in facts:
+        outputs[f"{name}.csv"]["hash"] = content_hash(os.path.join(warehouse_dir, f"{name}.csv"))
+
+    manifest["last_run"] = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "date_ids": months, "outputs": outputs}
+    save_manifest(warehouse_dir, manifest)
+    if check is not None:
+        report = check.report(staging_dir)
+        write_report(report, warehouse_dir)
+        log(f"Quality: {report['rows_rejected']:,} of {report['rows_checked']:,} staging rows quarantined")
+    log(f"Refreshed months: {', '.join(str(m) for m in months)}")
+    return months
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest new or changed monthly crime CSVs incrementally.")
+    parser.add_argument("crime_dir", help="Folder with the monthly police CSV files")
+    parser.add_argument("police_csv", help="Police force strength CSV")
+    parser.add_argument("--staging", default="crime_df_staging", help="Parquet staging folder")
+    parser.add_argument("--warehouse", default=".", help="Folder with fact_*.csv, dim_*.csv and the manifest")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument(
+        "--no-quality", action="store_true", help="Skip the data-quality checks, report and quarantine"
+    )
+    args = parser.parse_args(argv)
+    run(args.crime_dir, args.police_csv, args.staging, args.warehouse, args.batch_rows, not args.no_quality)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Opt-in per-rerun performance tracing for the dashboard.
+
+``begin()`` starts a trace for the current script run (one per Streamlit
+session thread). Code wrapped in ``stage(name)`` then records wall time,
+rows in / out and the change in resident memory, and ``finish()`` closes
+the trace and returns its records. Each stage and each finished rerun is
+also written as one JSON line to the ``ccc.perf`` logger, so slow stages
+and filter combinations can be found in production logs.
+
+When no trace is active ``stage`` does nothing beyond one thread-local
+lookup, so instrumented code costs nothing with diagnostics switched off.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ------------------ SETTINGS ------------------ #
+# "1" switches diagnostics on by default; CCC_PERF_LOG sends the JSON lines to a file.
+ENABLED_BY_DEFAULT = os.environ.get("CCC_PERF_TRACE", "") == "1"
+LOG_PATH = os.environ.get("CCC_PERF_LOG")
+
+logger = logging.getLogger("ccc.perf")
+_local = threading.local()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _configure_logger():
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(LOG_PATH) if LOG_PATH else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def current_rss():
+    """Resident set size in bytes (Linux), or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def row_count(value):
+    """Rows of a DataFrame-like result (None for figures, scalars, tuples of KPIs)."""
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+def describe_filters(filters):
+    """``filter_key`` tuple -> "year=2023; crime_type_id=3,5" ("" when unfiltered / absent)."""
+    if not isinstance(filters, tuple):
+        return ""
+    return "; ".join(f"{col}={','.join(str(v) for v in values)}" for col, values in filters)
+
+
+# ------------------ TRACE ------------------ #
+class PerfTrace:
+    """Stage records of one script run."""
+
+    def __init__(self, context=None):
+        self.rerun = uuid.uuid4().hex[:12]
+        self.context = context or {}
+        self.records = []
+        self.started = time.perf_counter()
+        self.rss = current_rss()
+
+    def add(self, record):
+        record = {"rerun": self.rerun, **record}
+        self.records.append(record)
+        logger.info(json.dumps({"event": "stage", **self.context, **record}, default=str))
+
+    def summary(self):
+        rss = current_rss()
+        return {
+            "event": "rerun",
+            "rerun": self.rerun,
+            **self.context,
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "stages": len(self.records),
+            "mem_delta_mb": None if rss is None or self.rss is None else round((rss - self.rss) / 1e6, 2),
+            "slowest": max(self.records, key=lambda r: r["seconds"])["stage"] if self.records else None,
+        }
+
+
+def begin(enabled, **context):
+    """Start tracing this thread's script run (or make sure tracing is off)."""
+    if not enabled:
+        _local.trace = None
+        return None
+    _configure_logger()
+    _local.trace = PerfTrace(context)
+    return _local.trace
+
+
+def active():
+    return getattr(_local, "trace", None)
+
+
+def finish():
+    """Close the current trace; returns (records, summary) or None when tracing is off."""
+    trace = active()
+    if trace is None:
+        return None
+    _local.trace = None
+    summary = trace.summary()
+    logger.info(json.dumps(summary, default=str))
+    return trace.records, summary
+
+
+@contextmanager
+def stage(name, rows_in=None, **fields):
+    """Time the enclosed block; set ``info["rows_out"]`` (or other fields) on the yielded dict."""
+    trace = active()
+    info = {"rows_in": rows_in, "rows_out": None, **fields}
+    if trace is None:
+        yield info
+        return
+    rss = current_rss()
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - started
+        after = current_rss()
+        trace.add({
+            "stage": name,
+            "seconds": round(seconds, 6),
+            **info,
+            "mem_delta_mb": None if rss is None or after is None else round((after - rss) / 1e6, 2),
+        })
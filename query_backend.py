@@ -0,0 +1,558 @@
+"""Query backends behind the dashboard tabs.
+
+The tabs ask a backend for filter options, row counts, grouped aggregates,
+distinct counts, map markers and scatter points instead of working on a
+DataFrame directly.
+
+``PandasBackend`` answers from a fully loaded frame through the filter
+index, rollup cube and grid pyramid. ``SQLBackend`` pushes the filter
+predicates and group-bys into an embedded engine (DuckDB when installed,
+otherwise SQLite) over a local copy of the fact file. Only aggregated or
+sampled rows come back, so the table no longer has to fit in the
+dashboard's memory.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from functools import cached_property
+
+import pandas as pd
+
+from chart_sampling import DENSITY_BINS, density_grid, proportional_quotas, stratified_sample
+from column_profile import EXACT_DISTINCT_ROWS, PROFILE_COLUMNS, TOP_VALUES, format_top, profile_frame
+from columnar_cache import CACHE_DIR, file_signature
+from data_export import EXPORT_CHUNK_ROWS
+from filter_index import FILTER_COLUMNS, FilterIndex
+from row_pager import PAGE_SIZE, SEARCH_KEYS, RowPager
+from rollup_cube import LABEL_DIMENSIONS, ROW_COUNT, RollupCube, finish_measures, label_rollup
+from spatial_bins import GRID_LEVELS, MAP_MARKER_BUDGET, SpatialPyramid
+from star_schema import DIMENSION_TABLES, Dimensions, is_key_only
+
+try:
+    import duckdb
+except ImportError:  # optional: SQLite is always available
+    duckdb = None
+
+SQLITE_CHUNK_ROWS = 200_000
+# Columns the SQLite copy is indexed on (the sidebar filters and cube keys).
+SQLITE_INDEXES = ["date_id", "lsoa_id", "crime_type_id", "outcome_id"]
+
+
+def available_engines():
+    """Query engines usable in this environment, in-memory pandas first."""
+    return ["pandas"] + (["duckdb"] if duckdb is not None else []) + ["sqlite"]
+
+
+class QueryBackend:
+    """Operations the dashboard tabs run against one fact table."""
+
+    name = None
+    fingerprint = None
+    columns = []
+    n_rows = 0
+
+    def total(self, measure, how="sum", selection=None):
+        """Scalar aggregate of ``measure`` under ``selection``."""
+        out = self.query([], {measure: how}, selection)
+        return out[measure].iloc[0] if len(out) else 0
+
+
+# ------------------ PANDAS ------------------ #
+class PandasBackend(QueryBackend):
+    """In-memory frame served through the filter index, rollup cube and grid pyramid."""
+
+    name = "pandas"
+
+    def __init__(self, df, star_dimensions=None):
+        # star_dimensions() -> Dimensions from the dim_* tables, used for key-only facts
+        self.df = df
+        self.fingerprint = df.attrs["fingerprint"]
+        self.columns = list(df.columns)
+        self.n_rows = len(df)
+        self._star_dimensions = star_dimensions
+
+    @cached_property
+    def dims(self):
+        if is_key_only(self.columns) and self._star_dimensions is not None:
+            return self._star_dimensions()
+        return Dimensions.from_fact(self.df)
+
+    @cached_property
+    def index(self):
+        return FilterIndex(self.df)
+
+    @cached_property
+    def cube(self):
+        return RollupCube(self.df, labels=self.dims.cube_labels(self.df))
+
+    @cached_property
+    def pyramid(self):
+        return SpatialPyramid(self.df)
+
+    @cached_property
+    def pager(self):
+        return RowPager(self.df, self.index, self.dims)
+
+    def options(self, col, selection=None):
+        return self.index.options(col, selection) if col in self.index else []
+
+    def normalise(self, selection):
+        return self.index.normalise(selection or {})
+
+    def rows(self, selection=None):
+        """Matching rows (the frame itself when unfiltered)."""
+        return self.index.apply(self.df, selection or {})
+
+    def count(self, selection=None):
+        positions = self.index.positions(selection or {})
+        return self.n_rows if positions is None else len(positions)
+
+    def query(self, by, measures, selection=None):
+        """Grouped ``measures`` ({column: "sum" | "mean" | "rows"}), from the cube when it covers them."""
+        if self.cube.covers(by, measures):
+            return self.cube.query(by, measures, selection)
+        frame = self.rows(selection)
+        aggs = {
+            m: (frame.columns[0], "size") if how == "rows" else (m, how)
+            for m, how in measures.items()
+        }
+        return frame.groupby(list(by), as_index=False, observed=True).agg(**aggs)
+
+    def nunique(self, col, selection=None):
+        if col in self.cube.dimensions:
+            return self.cube.nunique(col, selection)
+        return self.rows(selection)[col].nunique()
+
+    def map_markers(self, selection=None, budget=MAP_MARKER_BUDGET):
+        """(markers, grid cell size) – individual locations (cell None) or pyramid bins."""
+        positions = self.index.positions(selection or {})
+        if self.pyramid.location_count(positions) <= budget:
+            markers = (
+                self.rows(selection)
+                .groupby(["location_id", "longitude", "latitude"], as_index=False, observed=True)[
+                    self.pyramid.weight
+                ]
+                .sum()
+                .dropna(subset=["longitude", "latitude"])
+            )
+            return self.dims.attach(markers, keys=["location_id"]), None
+        return self.pyramid.bins(self.df, positions, budget)
+
+    def sample_rows(self, selection, by, n):
+        """At most ~``n`` matching rows, stratified on ``by``, with labels attached."""
+        return self.dims.attach(stratified_sample(self.rows(selection), by, n))
+
+    def density(self, selection, x, y, bins=DENSITY_BINS):
+        return density_grid(self.rows(selection), x, y, bins)
+
+    def browse_count(self, selection=None, search=""):
+        """Rows in the Data Explorer view for ``selection`` and ``search``."""
+        return self.pager.count(selection, search)
+
+    def page(self, selection=None, search="", sort=None, descending=False, offset=0, limit=PAGE_SIZE):
+        """One page of the Data Explorer view, sorted on ``sort``."""
+        return self.pager.page(selection, search, sort, descending, offset, limit)
+
+    def iter_rows(self, selection=None, search="", sort=None, descending=False, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Matching rows, labels attached, in chunks of ``chunk_rows`` (for exports)."""
+        return self.pager.chunks(selection, search, sort, descending, chunk_rows)
+
+    def column_summary(self):
+        return profile_frame(self.df)
+
+
+# ------------------ SQL ------------------ #
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _param(value):
+    # numpy scalars -> Python values for the DB-API drivers.
+    return value.item() if hasattr(value, "item") else value
+
+
+def _local_copy_path(path, engine, cache_dir):
+    abs_path = os.path.abspath(path)
+    key = hashlib.blake2b(abs_path.encode("utf-8"), digest_size=8).hexdigest()
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{key}.{engine}")
+
+
+def _read_signature(engine, target):
+    try:
+        if engine == "duckdb":
+            con = duckdb.connect(target, read_only=True)
+        else:
+            con = sqlite3.connect(f"file:{target}?mode=ro", uri=True)
+        try:
+            return con.execute("SELECT signature FROM source_signature").fetchone()[0]
+        finally:
+            con.close()
+    except Exception:
+        return None
+
+
+def build_local_copy(path, engine, target, signature):
+    """Load the fact CSV into a single-table database file (atomic replace)."""
+    tmp = target + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    if engine == "duckdb":
+        con = duckdb.connect(tmp)
+        literal = "'" + os.path.abspath(path).replace("'", "''") + "'"
+        con.execute(f"CREATE TABLE fact AS SELECT * FROM read_csv_auto({literal})")
+    else:
+        con = sqlite3.connect(tmp)
+        columns = []
+        for chunk in pd.read_csv(path, chunksize=SQLITE_CHUNK_ROWS):
+            chunk.to_sql("fact", con, if_exists="append", index=False)
+            columns = list(chunk.columns)
+        for col in SQLITE_INDEXES:
+            if col in columns:
+                con.execute(f"CREATE INDEX {_quote('ix_' + col)} ON fact ({_quote(col)})")
+    con.execute("CREATE TABLE source_signature (signature VARCHAR)")
+    con.execute("INSERT INTO source_signature VALUES (?)", [signature])
+    con.commit()
+    con.close()
+    os.replace(tmp, target)
+
+
+def _local_copy(path, engine, cache_dir=None):
+    """(target file, source signature) of the local copy of ``path``."""
+    cache_dir = cache_dir or CACHE_DIR
+    signature = json.dumps(file_signature(path), sort_keys=True)
+    return _local_copy_path(path, engine, cache_dir), signature
+
+
+def local_copy_current(path, engine, cache_dir=None):
+    """True when the local copy of ``path`` exists and matches the file."""
+    try:
+        target, signature = _local_copy(path, engine, cache_dir)
+    except OSError:
+        return False
+    return _read_signature(engine, target) == signature
+
+
+def prepare_local_copy(path, engine, cache_dir=None):
+    """Build the local copy of ``path`` unless it is current; returns (target, signature)."""
+    target, signature = _local_copy(path, engine, cache_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if _read_signature(engine, target) != signature:
+        build_local_copy(path, engine, target, signature)
+    return target, signature
+
+
+class SQLBackend(QueryBackend):
+    """Fact table queried in an embedded SQL engine; only aggregates are fetched."""
+
+    _FLOOR = {
+        "duckdb": "FLOOR({})",
+        # Cell offsets are never negative, so truncation is floor.
+        "sqlite": "CAST({} AS INTEGER)",
+    }
+
+    def __init__(self, path, engine="sqlite", star_dimensions=None, cache_dir=None):
+        if engine == "duckdb" and duckdb is None:
+            raise ImportError("The duckdb engine needs the optional `duckdb` package.")
+        self.name = engine
+        self._star_dimensions = star_dimensions
+        self._lock = threading.Lock()
+        self._options = {}
+
+        self._target, signature = prepare_local_copy(path, engine, cache_dir)
+        self.fingerprint = f"{engine}:" + hashlib.blake2b(signature.encode("utf-8"), digest_size=16).hexdigest()
+        self._con = self._connect()
+
+        self.columns = list(self._fetch("SELECT * FROM fact LIMIT 0").columns)
+        self.n_rows = int(self._fetch("SELECT COUNT(*) AS n FROM fact")["n"].iloc[0])
+
+    def _connect(self):
+        if self.name == "duckdb":
+            return duckdb.connect(self._target, read_only=True)
+        return sqlite3.connect(f"file:{self._target}?mode=ro", uri=True, check_same_thread=False)
+
+    def _fetch(self, sql, params=()):
+        with self._lock:
+            if self.name == "duckdb":
+                return self._con.execute(sql, list(params)).df()
+            return pd.read_sql_query(sql, self._con, params=list(params))
+
+    def _has(self, col):
+        return col in self.columns or (col in ("year", "month_number") and "date_id" in self.columns)
+
+    def _expr(self, col):
+        if col in self.columns:
+            return _quote(col)
+        # Key-only facts carry date_id alone.
+        if col == "year":
+            return "CAST((date_id - date_id % 100) / 100 AS INTEGER)"
+        if col == "month_number":
+            return "CAST(date_id % 100 AS INTEGER)"
+        raise KeyError(col)
+
+    def _where(self, selection, extra=()):
+        clauses, params = list(extra), []
+        for col, values in self.normalise(selection).items():
+            if not values:
+                clauses.append("1 = 0")
+                continue
+            clauses.append(f"{self._expr(col)} IN ({', '.join('?' * len(values))})")
+            params.extend(_param(v) for v in values)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _scalar(self, sql, params=()):
+        return self._fetch(sql, params).iloc[0, 0]
+
+    @cached_property
+    def dims(self):
+        if is_key_only(self.columns) and self._star_dimensions is not None:
+            return self._star_dimensions()
+        lookups = {
+            key: self._fetch(f"SELECT DISTINCT {_quote(key)}, {_quote(label)} FROM fact")
+            for key, (_, label) in DIMENSION_TABLES.items()
+            if key in self.columns and label in self.columns
+        }
+        return Dimensions(lookups, self.fingerprint)
+
+    def options(self, col, selection=None):
+        if col not in FILTER_COLUMNS or not self._has(col):
+            return []
+        expr = self._expr(col)
+        if selection and self.normalise(selection):
+            where, params = self._where(selection, [f"{expr} IS NOT NULL"])
+            frame = self._fetch(f"SELECT DISTINCT {expr} AS v FROM fact{where} ORDER BY 1", params)
+            return [_param(v) for v in frame["v"]]
+        if col not in self._options:
+            frame = self._fetch(f"SELECT DISTINCT {expr} AS v FROM fact WHERE {expr} IS NOT NULL ORDER BY 1")
+            self._options[col] = [_param(v) for v in frame["v"]]
+        return self._options[col]
+
+    def normalise(self, selection):
+        """Drop inactive filters (empty, or every option selected) and sort values."""
+        active = {}
+        for col, values in (selection or {}).items():
+            options = self.options(col)
+            if not options or not values:
+                continue
+            chosen = sorted(set(values) & set(options))
+            if len(chosen) == len(options):
+                continue
+            active[col] = tuple(chosen)
+        return active
+
+    def count(self, selection=None):
+        where, params = self._where(selection)
+        return int(self._scalar(f"SELECT COUNT(*) FROM fact{where}", params))
+
+    def query(self, by, measures, selection=None):
+        """Grouped ``measures`` computed in the engine; labels attached to the result rows."""
+        by = list(by)
+        group_dims = list(dict.fromkeys(LABEL_DIMENSIONS.get(c, c) for c in by))
+        select = [f"{self._expr(d)} AS {_quote(d)}" for d in group_dims]
+        select.append(f"COUNT(*) AS {_quote(ROW_COUNT)}")
+        for m, how in measures.items():
+            if how != "rows":
+                # Same sum / count columns as the rollup cube; integer sums stay integers.
+                total = f"COALESCE(SUM({_quote(m)}), 0)"
+                if "INT" in self._types.get(m, "").upper():
+                    total = f"CAST({total} AS BIGINT)"
+                select.append(f"{total} AS {_quote(m + '__sum')}")
+                select.append(f"COUNT({_quote(m)}) AS {_quote(m + '__count')}")
+        where, params = self._where(selection)
+        sql = f"SELECT {', '.join(select)} FROM fact{where}"
+        if group_dims:
+            sql += " GROUP BY " + ", ".join(str(i + 1) for i in range(len(group_dims)))
+        grouped = self._fetch(sql, params)
+        if not by:
+            return finish_measures(grouped, measures)
+        return label_rollup(grouped, by, measures, self.dims.cube_labels(grouped))
+
+    def nunique(self, col, selection=None):
+        where, params = self._where(selection)
+        return int(self._scalar(f"SELECT COUNT(DISTINCT {self._expr(col)}) FROM fact{where}", params))
+
+    @cached_property
+    def _origin(self):
+        frame = self._fetch("SELECT MIN(longitude) AS x, MIN(latitude) AS y FROM fact")
+        x, y = frame.iloc[0]
+        return (0.0, 0.0) if pd.isna(x) or pd.isna(y) else (float(x), float(y))
+
+    def map_markers(self, selection=None, budget=MAP_MARKER_BUDGET, weight="number_of_crime"):
+        """(markers, grid cell size) – individual locations (cell None) or grid bins."""
+        if self.nunique("location_id", selection) <= budget:
+            where, params = self._where(selection, ["longitude IS NOT NULL", "latitude IS NOT NULL"])
+            markers = self._fetch(
+                f"SELECT location_id, longitude, latitude, COALESCE(SUM({_quote(weight)}), 0) AS {_quote(weight)} "
+                f"FROM fact{where} GROUP BY 1, 2, 3",
+                params,
+            )
+            return self.dims.attach(markers, keys=["location_id"]), None
+
+        # Finest grid level whose occupied cells fit the budget, as SpatialPyramid does.
+        x0, y0 = self._origin
+        where, params = self._where(selection, ["longitude IS NOT NULL", "latitude IS NOT NULL"])
+        floor = self._FLOOR[self.name]
+        for size in sorted(GRID_LEVELS):
+            gx = floor.format(f"(longitude - {x0!r}) / {size!r}")
+            gy = floor.format(f"(latitude - {y0!r}) / {size!r}")
+            cells = self._scalar(
+                f"SELECT COUNT(*) FROM (SELECT DISTINCT {gx} AS gx, {gy} AS gy FROM fact{where}) AS c", params
+            )
+            if cells <= budget:
+                break
+        w = f"COALESCE({_quote(weight)}, 0)"
+        cells = self._fetch(
+            f"SELECT {gx} AS gx, {gy} AS gy, SUM({w}) AS total, COUNT(*) AS fact_rows, "
+            f"SUM(longitude * {w}) AS wlon, SUM(latitude * {w}) AS wlat FROM fact{where} GROUP BY 1, 2",
+            params,
+        )
+        total = cells["total"].astype("float64")
+        safe = total.where(total > 0)
+        markers = pd.DataFrame({
+            # Cells with no weight fall back to the cell centre.
+            "longitude": (cells["wlon"] / safe).fillna(x0 + (cells["gx"] + 0.5) * size),
+            "latitude": (cells["wlat"] / safe).fillna(y0 + (cells["gy"] + 0.5) * size),
+            weight: total.astype("int64"),
+            "fact_rows": cells["fact_rows"].astype("int64"),
+        })
+        return markers, size
+
+    def sample_rows(self, selection, by, n):
+        """At most ~``n`` matching rows, stratified on ``by`` in the engine, with labels attached."""
+        where, params = self._where(selection)
+        if self.count(selection) <= n:
+            return self.dims.attach(self._fetch(f"SELECT * FROM fact{where}", params))
+
+        sizes = self._fetch(f"SELECT {_quote(by)} AS g, COUNT(*) AS n FROM fact{where} GROUP BY 1", params)
+        quotas = proportional_quotas(sizes["n"].to_numpy(), n)
+        cases, case_params = [], []
+        for group, quota in zip(sizes["g"], quotas):
+            if pd.isna(group):
+                cases.append(f"WHEN {_quote(by)} IS NULL THEN ?")
+                case_params.append(int(quota))
+            else:
+                cases.append(f"WHEN {_quote(by)} = ? THEN ?")
+                case_params.extend([_param(group), int(quota)])
+        sample = self._fetch(
+            f"SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY {_quote(by)} ORDER BY random()) AS rn__ "
+            f"FROM fact{where}) AS s WHERE rn__ <= CASE {' '.join(cases)} ELSE 0 END",
+            params + case_params,
+        )
+        return self.dims.attach(sample.drop(columns="rn__"))
+
+    def density(self, selection, x, y, bins=DENSITY_BINS):
+        """2-D histogram binned from (x, y, count) groups computed in the engine."""
+        where, params = self._where(selection, [f"{_quote(x)} IS NOT NULL", f"{_quote(y)} IS NOT NULL"])
+        grouped = self._fetch(
+            f"SELECT {_quote(x)}, {_quote(y)}, COUNT(*) AS n FROM fact{where} GROUP BY 1, 2", params
+        )
+        return density_grid(grouped, x, y, bins, weight="n")
+
+    def _search(self, text):
+        """(clause, params) matching ``text`` in the LSOA name, location or crime type."""
+        clauses, params = [], []
+        for key in SEARCH_KEYS:
+            label = DIMENSION_TABLES[key][1]
+            if label in self.columns:
+                escaped = text.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                clauses.append(f"LOWER({_quote(label)}) LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+            elif key in self.columns and key in self.dims:
+                # Key-only fact: match the labels in the dim table, filter on the keys.
+                keys = self.dims.search(key, text)
+                if keys:
+                    clauses.append(f"{_quote(key)} IN ({', '.join('?' * len(keys))})")
+                    params.extend(_param(k) for k in keys)
+        return "(" + (" OR ".join(clauses) or "1 = 0") + ")", params
+
+    def _browse_where(self, selection, search):
+        where, params = self._where(selection)
+        if not search:
+            return where, params
+        clause, search_params = self._search(search)
+        return (where + " AND " if where else " WHERE ") + clause, params + search_params
+
+    def browse_count(self, selection=None, search=""):
+        where, params = self._browse_where(selection, search)
+        return int(self._scalar(f"SELECT COUNT(*) FROM fact{where}", params))
+
+    def page(self, selection=None, search="", sort=None, descending=False, offset=0, limit=PAGE_SIZE):
+        """One page of the Data Explorer view; the engine sorts and skips to ``offset``."""
+        where, params = self._browse_where(selection, search)
+        frame = self._fetch(
+            f"SELECT * FROM fact{where}{self._order(sort, descending)} LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)],
+        )
+        return self.dims.attach(frame)
+
+    def _order(self, sort, descending):
+        order = " ORDER BY "
+        if sort is not None:
+            order += f"{_quote(sort)} {'DESC' if descending else 'ASC'} NULLS LAST, "
+        return order + "rowid"
+
+    def iter_rows(self, selection=None, search="", sort=None, descending=False, chunk_rows=EXPORT_CHUNK_ROWS):
+        """Matching rows, labels attached, streamed from the engine in chunks of ``chunk_rows``.
+
+        Runs on its own connection so a long export does not hold the lock
+        the dashboard's queries share.
+        """
+        where, params = self._browse_where(selection, search)
+        sql = f"SELECT * FROM fact{where}{self._order(sort, descending)}"
+        con = self._connect()
+        try:
+            if self.name == "duckdb":
+                reader = con.execute(sql, params).to_arrow_reader(chunk_rows)
+                chunks = (batch.to_pandas() for batch in reader)
+            else:
+                chunks = pd.read_sql_query(sql, con, params=params, chunksize=chunk_rows)
+            for chunk in chunks:
+                yield self.dims.attach(chunk)
+        finally:
+            con.close()
+
+    @cached_property
+    def _types(self):
+        """{column: engine type name}."""
+        if self.name == "duckdb":
+            types = self._fetch(
+                "SELECT column_name AS name, data_type AS type FROM information_schema.columns "
+                "WHERE table_name = 'fact'"
+            )
+        else:
+            types = self._fetch("PRAGMA table_info(fact)")
+        return dict(zip(types["name"], types["type"]))
+
+    def column_summary(self):
+        """Column profile (see ``column_profile``) computed in two engine queries."""
+        # DuckDB sketches distinct counts on large tables; SQLite counts them exactly.
+        approx = self.name == "duckdb" and self.n_rows > EXACT_DISTINCT_ROWS
+        distinct = "approx_count_distinct({})" if approx else "COUNT(DISTINCT {})"
+        exprs = ", ".join(
+            f"{distinct.format(_quote(c))} AS d{i}, COUNT(*) - COUNT({_quote(c)}) AS m{i}, "
+            f"MIN({_quote(c)}) AS lo{i}, MAX({_quote(c)}) AS hi{i}"
+            for i, c in enumerate(self.columns)
+        )
+        row = self._fetch(f"SELECT {exprs} FROM fact").iloc[0]
+        top = self._fetch(" UNION ALL ".join(
+            f"SELECT * FROM (SELECT {i} AS c, CAST({_quote(c)} AS VARCHAR) AS v, COUNT(*) AS n FROM fact "
+            f"WHERE {_quote(c)} IS NOT NULL GROUP BY {_quote(c)} ORDER BY n DESC, v LIMIT {TOP_VALUES}) AS t{i}"
+            for i, c in enumerate(self.columns)
+        ))
+        types = self._types
+        rows = []
+        for i, c in enumerate(self.columns):
+            values = top[top["c"] == i]
+            rows.append({
+                "column": c,
+                "dtype": types.get(c, ""),
+                "n_unique": int(row[f"d{i}"]),
+                "n_missing": int(row[f"m{i}"]),
+                "min": "" if pd.isna(row[f"lo{i}"]) else str(row[f"lo{i}"]),
+                "max": "" if pd.isna(row[f"hi{i}"]) else str(row[f"hi{i}"]),
+                "top_values": format_top(values["v"], values["n"]),
+                "approx": approx,
+            })
+        return pd.DataFrame(rows, columns=PROFILE_COLUMNS)
@@ -0,0 +1,98 @@
+"""Process-wide LRU cache for computed KPIs, aggregates and figures.
+
+Entries are keyed by (dataset fingerprint, normalised filter tuple, chart id),
+so the same view requested again – by any session – is served without
+recomputation. Size is bounded by entry count with least-recently-used
+eviction, and hit / miss / eviction counters are kept for diagnostics.
+"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+def filter_key(selection):
+    """Hashable, order-independent form of a filter selection."""
+    return tuple(
+        (col, tuple(sorted(values)))
+        for col, values in sorted((selection or {}).items())
+        if values
+    )
+
+
+def result_key(fingerprint, selection, chart_id):
+    return (fingerprint, filter_key(selection), chart_id)
+
+
+def touches_months(filters, date_ids):
+    """Whether a ``filter_key`` can read rows from any of ``date_ids`` (YYYYMM)."""
+    selected = dict(filters)
+    years = selected.get("year")
+    months = selected.get("month_number")
+    return any(
+        (years is None or d // 100 in years) and (months is None or d % 100 in months)
+        for d in date_ids
+    )
+
+
+class ResultCache:
+    """Thread-safe bounded LRU mapping of result keys to computed values."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Compute outside the lock so one slow chart does not block other sessions.
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, fingerprint=None):
+        """Drop every entry, or only those computed for ``fingerprint``."""
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == fingerprint]:
+                del self._entries[key]
+
+    def carry_over(self, stale, fresh, keep):
+        """Re-key entries of ``stale`` whose filter key passes ``keep`` to ``fresh``; drop the rest."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == stale]:
+                value = self._entries.pop(key)
+                if keep(key[1]):
+                    self._entries[(fresh,) + key[1:]] = value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,209 @@
+"""Pre-aggregated rollup cube for the dashboard charts.
+
+The base cuboid groups a fact table by its dimension keys (date_id, lsoa_id,
+crime_type_id and, for fact_resolution, outcome_id) and stores sum / non-null
+count per measure plus the fact row count. Every coarser rollup is derived
+from its smallest already-built parent at load time. A chart query is then
+answered from the rollup whose dimensions are exactly the group-by plus the
+filtered dimensions, so its cost depends on the number of groups rather than
+the number of fact rows.
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+CUBE_DIMENSIONS = ["date_id", "lsoa_id", "crime_type_id", "outcome_id"]
+
+MEASURE_COLUMNS = [
+    "number_of_crime",
+    "number_of_crime_occuring",
+    "number_of_resolution",
+    "police_officer_strength",
+    "police_staff_strength",
+    "pcso_strength",
+]
+
+# Label column -> dimension key it describes.
+LABEL_DIMENSIONS = {
+    "year": "date_id",
+    "month_number": "date_id",
+    "year_month": "date_id",
+    "lsoa_name": "lsoa_id",
+    "crime_type": "crime_type_id",
+    "last_outcome_category": "outcome_id",
+}
+
+ROW_COUNT = "__rows"
+
+
+def _sum_col(measure):
+    return f"{measure}__sum"
+
+
+def _count_col(measure):
+    return f"{measure}__count"
+
+
+def date_labels(date_ids):
+    """year / month_number / year_month for a set of YYYYMM keys."""
+    date_ids = pd.Index(pd.unique(np.asarray(date_ids))).sort_values()
+    values = date_ids.to_numpy()
+    return pd.DataFrame({
+        "date_id": values,
+        "year": (values // 100).astype("int16"),
+        "month_number": (values % 100).astype("int16"),
+        "year_month": [f"{d // 100}-{d % 100:02d}" for d in values.tolist()],
+    })
+
+
+def labels_from_fact(df):
+    """Dimension lookup tables taken from the denormalised label columns of ``df``."""
+    labels = {}
+    if "date_id" in df.columns:
+        labels["date_id"] = date_labels(df["date_id"])
+    for label, dim in LABEL_DIMENSIONS.items():
+        if dim == "date_id" or dim not in df.columns or label not in df.columns:
+            continue
+        lookup = df[[dim, label]].drop_duplicates(dim)
+        lookup[label] = lookup[label].astype(object)
+        labels[dim] = lookup.reset_index(drop=True)
+    return labels
+
+
+def label_rollup(grouped, by, measures, labels):
+    """Turn rows grouped on dimension keys into the ``by`` columns plus ``measures``.
+
+    ``grouped`` holds the keys ``by`` maps to and the sum / count columns.
+    Labels are merged onto these aggregated rows only.
+    """
+    group_dims = [LABEL_DIMENSIONS.get(c, c) for c in by]
+    dims = list(dict.fromkeys(group_dims))
+    value_cols = [c for c in grouped.columns if c not in dims]
+    for dim in dims:
+        wanted = [c for c, d in zip(by, group_dims) if d == dim and c != dim]
+        if wanted:
+            grouped = grouped.merge(labels[dim][[dim] + wanted], on=dim, how="left")
+    # Several keys may share one label (e.g. a renamed LSOA), so regroup on labels.
+    if any(c not in dims for c in by):
+        grouped = grouped.groupby(by, sort=False, dropna=False)[value_cols].sum().reset_index()
+    return finish_measures(grouped, measures, by)
+
+
+def finish_measures(grouped, measures, by=()):
+    """Final ``measures`` ({column: "sum" | "mean" | "rows"}) from sum / count columns."""
+    out = grouped[list(by)].copy() if by else pd.DataFrame(index=grouped.index)
+    for m, how in measures.items():
+        if how == "rows":
+            out[m] = grouped[ROW_COUNT].to_numpy()
+        elif how == "sum":
+            out[m] = grouped[_sum_col(m)].to_numpy()
+        elif how == "mean":
+            out[m] = (grouped[_sum_col(m)] / grouped[_count_col(m)].replace(0, np.nan)).to_numpy()
+        else:
+            raise ValueError(f"Unsupported aggregation {how!r} for {m!r}")
+    return out.reset_index(drop=True)
+
+
+class RollupCube:
+    """All rollups of a fact table over its dimension keys."""
+
+    def __init__(self, df, labels=None):
+        self.dimensions = [d for d in CUBE_DIMENSIONS if d in df.columns]
+        self.measures = [m for m in MEASURE_COLUMNS if m in df.columns]
+        self.labels = labels if labels is not None else labels_from_fact(df)
+        self.n_rows = len(df)
+
+        base = df[self.dimensions + self.measures].copy()
+        aggs = {ROW_COUNT: (self.dimensions[0], "size")}
+        for m in self.measures:
+            aggs[_sum_col(m)] = (m, "sum")
+            aggs[_count_col(m)] = (m, "count")
+        # dropna=False: rows with a null key still count toward every total.
+        base = base.groupby(self.dimensions, observed=True, sort=False, dropna=False).agg(**aggs).reset_index()
+
+        self._rollups = {frozenset(self.dimensions): base}
+        value_cols = [ROW_COUNT] + [c for m in self.measures for c in (_sum_col(m), _count_col(m))]
+        for size in range(len(self.dimensions) - 1, -1, -1):
+            for dims in combinations(self.dimensions, size):
+                key = frozenset(dims)
+                parent = min(
+                    (r for k, r in self._rollups.items() if key < k and len(k) == size + 1),
+                    key=len,
+                )
+                if dims:
+                    rollup = parent.groupby(list(dims), sort=False, dropna=False)[value_cols].sum().reset_index()
+                else:
+                    rollup = parent[value_cols].sum().to_frame().T
+                self._rollups[key] = rollup
+
+    def covers(self, by, measures):
+        """Whether ``query(by, measures)`` can be answered from the rollups."""
+        dims = {LABEL_DIMENSIONS.get(c, c) for c in by}
+        return dims <= set(self.dimensions) and all(
+            how == "rows" or m in self.measures for m, how in measures.items()
+        )
+
+    def rollup_sizes(self):
+        return {tuple(sorted(k)): len(v) for k, v in self._rollups.items()}
+
+    # ------------------ FILTERS ------------------ #
+    def _dimension_filters(self, selection):
+        """Translate a label selection into allowed key values per dimension."""
+        allowed = {}
+        for col, values in (selection or {}).items():
+            if not values:
+                continue
+            dim = LABEL_DIMENSIONS.get(col, col)
+            if dim not in self.dimensions:
+                continue
+            if col == dim:
+                keys = set(values)
+            else:
+                lookup = self.labels[dim]
+                keys = set(lookup.loc[lookup[col].isin(list(values)), dim].tolist())
+            allowed[dim] = allowed[dim] & keys if dim in allowed else keys
+        return allowed
+
+    # ------------------ QUERIES ------------------ #
+    def query(self, by, measures, selection=None):
+        """Aggregate ``measures`` ({column: "sum" | "mean" | "rows"}) grouped by ``by``.
+
+        ``by`` may mix dimension keys and label columns; labels are attached
+        to the aggregated rows only. ``selection`` uses the sidebar filter
+        columns ({"year": [...], "lsoa_name": [...], ...}).
+        """
+        by = list(by)
+        allowed = self._dimension_filters(selection)
+        group_dims = [LABEL_DIMENSIONS.get(c, c) for c in by]
+        needed = frozenset(group_dims) | frozenset(allowed)
+        rollup = self._rollups[needed]
+
+        if allowed:
+            mask = np.ones(len(rollup), dtype=bool)
+            for dim, keys in allowed.items():
+                mask &= rollup[dim].isin(list(keys)).to_numpy()
+            rollup = rollup[mask]
+
+        value_cols = [ROW_COUNT] + [
+            c for m in measures if m in self.measures for c in (_sum_col(m), _count_col(m))
+        ]
+        if not by:
+            totals = rollup[value_cols].sum().to_frame().T
+            return finish_measures(totals, measures)
+
+        dims = list(dict.fromkeys(group_dims))
+        grouped = rollup.groupby(dims, sort=False, dropna=False)[value_cols].sum().reset_index()
+        out = label_rollup(grouped, by, measures, self.labels)
+        # As in a plain groupby, null keys or labels form no group of their own.
+        return out.dropna(subset=by).reset_index(drop=True)
+
+    def total(self, measure, how="sum", selection=None):
+        """Scalar aggregate of ``measure`` under ``selection``."""
+        out = self.query([], {measure: how}, selection)
+        return out[measure].iloc[0] if len(out) else 0
+
+    def nunique(self, dim, selection=None):
+        """Number of distinct ``dim`` keys with at least one fact row."""
+        out = self.query([dim], {ROW_COUNT: "rows"}, selection)
+        return int((out[ROW_COUNT] > 0).sum())
@@ -0,0 +1,89 @@
+"""Paged, sorted and searched row access for the Data Explorer.
+
+Each sort column gets a stable permutation of the table (nulls last), built
+on first use and kept for the life of the dataset. The rows of a view
+(filters + search + sort) are that permutation masked down to the matching
+rows; the ordering is cached per view so page turns only slice it and take
+one page of rows. Nothing but the requested page is materialised.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from result_cache import ResultCache, filter_key
+
+PAGE_SIZE = 100
+# Row orderings kept per table (one int32 array per filter / search / sort view).
+ORDER_CACHE_ENTRIES = 8
+# Label columns the text search looks in, through their surrogate keys.
+SEARCH_KEYS = ["lsoa_id", "location_id", "crime_type_id"]
+
+
+class RowPager:
+    """Pages of ``df`` under a filter selection, text search and sort."""
+
+    def __init__(self, df, index, dims):
+        # index: FilterIndex of df; dims: Dimensions for its keys
+        self.df = df
+        self.index = index
+        self.dims = dims
+        self._permutations = {}
+        self._lock = threading.Lock()
+        self._orders = ResultCache(max_entries=ORDER_CACHE_ENTRIES)
+
+    def permutation(self, col, descending=False):
+        """Row positions sorted by ``col`` (stable, nulls last)."""
+        key = (col, descending)
+        with self._lock:
+            if key in self._permutations:
+                return self._permutations[key]
+        codes, uniques = pd.factorize(self.df[col], sort=True, use_na_sentinel=True)
+        missing = len(uniques)
+        rank = np.where(codes < 0, missing, missing - 1 - codes if descending else codes)
+        perm = np.argsort(rank, kind="stable").astype(np.int32)
+        with self._lock:
+            self._permutations[key] = perm
+        return perm
+
+    def search_mask(self, text):
+        """Rows whose LSOA name, location or crime type contains ``text``."""
+        mask = np.zeros(len(self.df), dtype=bool)
+        for key in SEARCH_KEYS:
+            if key in self.df.columns and key in self.dims:
+                mask |= self.df[key].isin(self.dims.search(key, text)).to_numpy(dtype=bool)
+        return mask
+
+    def order(self, selection=None, search="", sort=None, descending=False):
+        """Positions of the matching rows in display order."""
+        view = (filter_key(selection), search, sort, descending)
+        return self._orders.get_or_compute(view, lambda: self._order(selection, search, sort, descending))
+
+    def _order(self, selection, search, sort, descending):
+        positions = self.index.positions(selection or {})
+        mask = None
+        if positions is not None:
+            mask = np.zeros(len(self.df), dtype=bool)
+            mask[positions] = True
+        if search:
+            found = self.search_mask(search)
+            mask = found if mask is None else mask & found
+        if sort is None:
+            return np.arange(len(self.df), dtype=np.int32) if mask is None else np.flatnonzero(mask).astype(np.int32)
+        perm = self.permutation(sort, descending)
+        return perm if mask is None else perm[mask[perm]]
+
+    def count(self, selection=None, search=""):
+        return len(self.order(selection, search))
+
+    def page(self, selection=None, search="", sort=None, descending=False, offset=0, limit=PAGE_SIZE):
+        """One page of rows with labels attached."""
+        rows = self.order(selection, search, sort, descending)[offset:offset + limit]
+        return self.dims.attach(self.df.take(rows))
+
+    def chunks(self, selection=None, search="", sort=None, descending=False, chunk_rows=PAGE_SIZE):
+        """Every row of the view in slices of ``chunk_rows``, labels attached (at least one, maybe empty)."""
+        rows = self.order(selection, search, sort, descending)
+        for start in range(0, max(len(rows), 1), chunk_rows):
+            yield self.dims.attach(self.df.take(rows[start:start + chunk_rows]))
+
@@ -0,0 +1,90 @@
+"""Grid pyramid for the Crime Locations map.
+
+For each zoom level (a square grid of ``size`` degrees) every fact row is
+assigned a cell code once per dataset. At render time the filtered rows are
+binned with ``np.bincount`` at the finest level whose occupied cell count
+fits the marker budget, so the browser receives at most ``budget`` markers
+carrying summed ``number_of_crime`` at their crime-weighted centroid.
+"""
+import numpy as np
+import pandas as pd
+
+MAP_MARKER_BUDGET = 2000
+
+# Cell edge in degrees, coarse -> fine (0.0025° is roughly 250 m in the UK).
+GRID_LEVELS = [0.32, 0.16, 0.08, 0.04, 0.02, 0.01, 0.005, 0.0025]
+
+
+class _Level:
+    def __init__(self, size, lon, lat, valid, origin):
+        self.size = size
+        gx = np.floor((lon - origin[0]) / size)
+        gy = np.floor((lat - origin[1]) / size)
+        key = np.where(valid, gx * 1e7 + gy, np.nan)
+        codes, cells = pd.factorize(key, use_na_sentinel=True)
+        self.codes = codes.astype(np.int32)
+        self.n_cells = len(cells)
+        cells = np.asarray(cells)
+        self.centre_lon = origin[0] + (np.floor(cells / 1e7) + 0.5) * size
+        self.centre_lat = origin[1] + (np.mod(cells, 1e7) + 0.5) * size
+
+
+class SpatialPyramid:
+    """Per-row grid cell codes at several resolutions for one fact table."""
+
+    def __init__(self, df, levels=GRID_LEVELS, weight="number_of_crime"):
+        self.weight = weight
+        lon = df["longitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+        lat = df["latitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~(np.isnan(lon) | np.isnan(lat))
+        origin = (np.nanmin(lon), np.nanmin(lat)) if valid.any() else (0.0, 0.0)
+        self._lon = lon
+        self._lat = lat
+        self.levels = [_Level(size, lon, lat, valid, origin) for size in sorted(levels, reverse=True)]
+        self.location_codes = (
+            pd.factorize(df["location_id"])[0].astype(np.int32) if "location_id" in df.columns else None
+        )
+
+    def location_count(self, positions=None):
+        """Distinct locations among the selected rows (what the point map would draw)."""
+        codes = self.location_codes if positions is None else self.location_codes[positions]
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0]))) if len(codes) else 0
+
+    def choose_level(self, positions=None, budget=MAP_MARKER_BUDGET):
+        """Finest level whose occupied cells for the selected rows fit ``budget``."""
+        for level in reversed(self.levels):
+            if level.n_cells <= budget:
+                # Every coarser level fits too, and nothing finer did.
+                return level
+            codes = level.codes if positions is None else level.codes[positions]
+            if np.unique(codes[codes >= 0]).size <= budget:
+                return level
+        return self.levels[0]
+
+    def bins(self, df, positions=None, budget=MAP_MARKER_BUDGET):
+        """Aggregated markers for the rows of ``df`` at ``positions`` (None = all)."""
+        level = self.choose_level(positions, budget)
+        codes = level.codes if positions is None else level.codes[positions]
+        rows = slice(None) if positions is None else positions
+        weights = df[self.weight].to_numpy(dtype=np.float64, na_value=0.0)[rows]
+        lon, lat = self._lon[rows], self._lat[rows]
+
+        keep = codes >= 0
+        codes, weights, lon, lat = codes[keep], weights[keep], lon[keep], lat[keep]
+        total = np.bincount(codes, weights=weights, minlength=level.n_cells)
+        points = np.bincount(codes, minlength=level.n_cells)
+        wlon = np.bincount(codes, weights=lon * weights, minlength=level.n_cells)
+        wlat = np.bincount(codes, weights=lat * weights, minlength=level.n_cells)
+
+        occupied = np.flatnonzero(points)
+        safe = np.where(total[occupied] > 0, total[occupied], np.nan)
+        out = pd.DataFrame({
+            "longitude": wlon[occupied] / safe,
+            "latitude": wlat[occupied] / safe,
+            self.weight: total[occupied].astype(np.int64),
+            "fact_rows": points[occupied],
+        })
+        # Cells with no weight fall back to the cell centre.
+        out["longitude"] = out["longitude"].fillna(pd.Series(level.centre_lon[occupied]))
+        out["latitude"] = out["latitude"].fillna(pd.Series(level.centre_lat[occupied]))
+        return out, level.size
@@ -0,0 +1,156 @@
+"""Normalised (star-schema) layout for the dashboard's fact tables.
+
+A key-only fact keeps ``date_id``, the surrogate keys, the coordinates and
+the measures; the text labels live once in the small ``dim_*`` tables.
+Coordinates stay on the fact because they are averaged within the fact
+grain and are not a function of ``location_id`` alone.
+
+``Dimensions`` is the label lookup the dashboard works through in both
+layouts. It is built from the dim tables for key-only facts, or from the
+label columns of a denormalised fact. Filters and group-bys run on the
+integer keys, and labels are attached to aggregated or sampled rows only.
+
+Run ``python star_schema.py fact_*.csv --out star`` to split denormalised
+fact CSVs into key-only facts plus ``dim_*.csv``.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from fact_schema import table_from_path, year_month_from_date_id
+from rollup_cube import date_labels
+
+# ------------------ LAYOUT ------------------ #
+# Surrogate key -> (dimension table, label column).
+DIMENSION_TABLES = {
+    "lsoa_id": ("dim_lsoaname", "lsoa_name"),
+    "location_id": ("dim_location", "location"),
+    "crime_type_id": ("dim_crime_type", "crime_type"),
+    "outcome_id": ("dim_outcome", "last_outcome_category"),
+}
+LABEL_KEYS = {label: key for key, (_, label) in DIMENSION_TABLES.items()}
+# Derived from date_id on load.
+DATE_LABEL_COLUMNS = ["year", "month_number", "year_month"]
+
+
+def is_key_only(columns):
+    """True when ``columns`` hold a surrogate key without its label column."""
+    columns = set(columns)
+    return any(key in columns and label not in columns for key, (_, label) in DIMENSION_TABLES.items())
+
+
+def key_only(df):
+    """The fact without its label columns and the date parts derivable from ``date_id``."""
+    dropped = [c for c in list(LABEL_KEYS) + DATE_LABEL_COLUMNS if c in df.columns]
+    return df.drop(columns=dropped)
+
+
+# ------------------ DIMENSIONS ------------------ #
+class Dimensions:
+    """{surrogate key: label lookup} with vectorised key -> label mapping."""
+
+    def __init__(self, lookups, fingerprint=None):
+        # lookups: {key: DataFrame[key, label]} with unique keys
+        self.fingerprint = fingerprint
+        self._lookups = {}
+        self._index = {}
+        for key, frame in lookups.items():
+            label = DIMENSION_TABLES[key][1]
+            frame = frame[[key, label]].drop_duplicates(key).reset_index(drop=True)
+            frame[label] = frame[label].astype(object)
+            self._lookups[key] = frame
+            self._index[key] = pd.Index(frame[key].to_numpy())
+
+    @classmethod
+    def from_tables(cls, tables):
+        """From loaded dim tables ({"dim_lsoaname": df, ...})."""
+        lookups = {}
+        for key, (name, _) in DIMENSION_TABLES.items():
+            if tables.get(name) is not None:
+                lookups[key] = tables[name]
+        fingerprint = "+".join(str(tables[n].attrs.get("fingerprint")) for n in sorted(tables) if tables[n] is not None)
+        return cls(lookups, fingerprint)
+
+    @classmethod
+    def from_fact(cls, df):
+        """From the label columns of a denormalised fact."""
+        lookups = {
+            key: df[[key, label]]
+            for key, (_, label) in DIMENSION_TABLES.items()
+            if key in df.columns and label in df.columns
+        }
+        return cls(lookups, df.attrs.get("fingerprint"))
+
+    def __contains__(self, key):
+        return key in self._lookups
+
+    def labels(self, key, ids):
+        """Labels for ``ids`` (None where a key has no dimension row)."""
+        positions = self._index[key].get_indexer(np.asarray(ids))
+        values = self._lookups[key][DIMENSION_TABLES[key][1]].to_numpy()
+        return np.append(values, None)[positions]
+
+    def keys_for(self, key, labels):
+        """Every key whose label is in ``labels``."""
+        frame = self._lookups[key]
+        return frame.loc[frame[DIMENSION_TABLES[key][1]].isin(list(labels)), key].tolist()
+
+    def search(self, key, text):
+        """Every key whose label contains ``text`` (case-insensitive)."""
+        frame = self._lookups[key]
+        found = frame[DIMENSION_TABLES[key][1]].astype("string").str.contains(text, case=False, regex=False)
+        return frame.loc[found.fillna(False).to_numpy(dtype=bool), key].tolist()
+
+    def attach(self, df, keys=None):
+        """``df`` with label columns added for its keys (and date parts for ``date_id``)."""
+        out = df.copy(deep=False)
+        for key in keys or [k for k in DIMENSION_TABLES if k in df.columns]:
+            label = DIMENSION_TABLES[key][1]
+            if label not in out.columns and key in self._lookups:
+                out[label] = self.labels(key, out[key])
+        if "date_id" in out.columns and "year_month" not in out.columns:
+            out["year_month"] = year_month_from_date_id(out["date_id"])
+        return out
+
+    def cube_labels(self, df):
+        """Label tables in the form ``RollupCube(labels=...)`` expects."""
+        labels = {key: frame for key, frame in self._lookups.items() if key in df.columns}
+        if "date_id" in df.columns:
+            labels["date_id"] = date_labels(df["date_id"])
+        return labels
+
+
+# ------------------ SPLIT ------------------ #
+def dimension_tables(facts):
+    """dim_* tables gathered from the label columns of denormalised facts."""
+    tables = {}
+    for key, (name, label) in DIMENSION_TABLES.items():
+        parts = [df[[key, label]] for df in facts if key in df.columns and label in df.columns]
+        if parts:
+            dim = pd.concat(parts).drop_duplicates(key).sort_values(key)
+            dim[label] = dim[label].astype(object)
+            tables[name] = dim.reset_index(drop=True)
+    return tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split denormalised fact CSVs into key-only facts and dims.")
+    parser.add_argument("facts", nargs="+", help="fact_*.csv files")
+    parser.add_argument("--out", default="star", help="Output folder")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    facts = {table_from_path(p) or os.path.splitext(os.path.basename(p))[0]: pd.read_csv(p) for p in args.facts}
+    tables = {**dimension_tables(list(facts.values())), **{n: key_only(df) for n, df in facts.items()}}
+    for name, df in tables.items():
+        path = os.path.join(args.out, f"{name}.csv")
+        df.to_csv(path, index=False)
+        print(f"{path}: {len(df):,} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Seeded synthetic police data at a configurable scale.
+
+Writes monthly street-crime CSVs in the police.uk layout plus a police
+strength CSV, so the whole pipeline (``crime_etl`` -> ``fact_builder`` ->
+dashboard) can be exercised at production size without the real extract.
+
+Cardinalities grow with the row count roughly as they do in the real data
+(about one LSOA per 600 crimes up to the 35,000 English LSOAs, one location
+per 8 crimes up to 800,000) and are skewed: a few LSOAs, streets and crime
+types account for most rows. Every location sits in one LSOA and its
+coordinates are jittered around that LSOA's centre. The same seed and scale
+always produce the same files.
+
+Usage::
+
+    python synthetic_data.py 2.2M --out synthetic --seed 7
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+# ------------------ SETTINGS ------------------ #
+DEFAULT_SEED = 7
+DEFAULT_MONTHS = 36
+FIRST_MONTH = "2022-01"  # dim_date covers 2020-2025
+
+MAX_LSOAS = 35_000
+MAX_LOCATIONS = 800_000
+ROWS_PER_LSOA = 600
+ROWS_PER_LOCATION = 8
+MISSING_COORDINATE_SHARE = 0.01
+MISSING_OUTCOME_SHARE = 0.02
+
+FORCE = "West Yorkshire Police"
+DISTRICTS = ["Leeds", "Bradford", "Kirklees", "Wakefield", "Calderdale"]
+CENTRE = (-1.65, 53.75)  # lon, lat
+SPREAD = (0.35, 0.18)
+
+# (crime type, relative frequency) – roughly the national mix.
+CRIME_TYPES = [
+    ("Violence and sexual offences", 33),
+    ("Anti-social behaviour", 17),
+    ("Public order", 9),
+    ("Criminal damage and arson", 8),
+    ("Shoplifting", 7),
+    ("Other theft", 6),
+    ("Vehicle crime", 6),
+    ("Burglary", 4),
+    ("Drugs", 3),
+    ("Other crime", 2),
+    ("Robbery", 1.2),
+    ("Theft from the person", 1.2),
+    ("Possession of weapons", 1),
+    ("Bicycle theft", 1),
+]
+OUTCOMES = [
+    ("Investigation complete; no suspect identified", 30),
+    ("Unable to prosecute suspect", 28),
+    ("Under investigation", 10),
+    ("Status update unavailable", 8),
+    ("Awaiting court outcome", 5),
+    ("Local resolution", 4),
+    ("Court result unavailable", 3),
+    ("Further investigation is not in the public interest", 3),
+    ("Offender given a caution", 2),
+    ("Action to be taken by another organisation", 2),
+    ("Formal action is not in the public interest", 1.5),
+    ("Suspect charged as part of another case", 1),
+    ("Offender given penalty notice", 0.5),
+]
+STREET_KINDS = ["Street", "Road", "Lane", "Avenue", "Close", "Drive", "Way", "Grove"]
+PLACES = ["Parking Area", "Supermarket", "Petrol Station", "Shopping Area", "Sports/Recreation Area",
+          "Nightclub", "Further/Higher Educational Building", "Police Station", "Hospital"]
+
+
+# ------------------ SCALE ------------------ #
+def parse_scale(text):
+    """'100k' / '2.2M' / '20000' -> number of crime rows."""
+    text = str(text).strip().lower().replace(",", "").replace("_", "")
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def cardinalities(n_rows):
+    return {
+        "lsoas": int(min(MAX_LSOAS, max(50, n_rows // ROWS_PER_LSOA))),
+        "locations": int(min(MAX_LOCATIONS, max(200, n_rows // ROWS_PER_LOCATION))),
+        "crime_types": len(CRIME_TYPES),
+        "outcomes": len(OUTCOMES),
+    }
+
+
+def _zipf_weights(n, s, rng):
+    # Skewed popularity, shuffled so id order carries no meaning.
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _weights(pairs):
+    w = np.array([p for _, p in pairs], dtype=np.float64)
+    return w / w.sum()
+
+
+# ------------------ ENTITIES ------------------ #
+def build_entities(n_rows, seed=DEFAULT_SEED):
+    """LSOAs and locations (names, codes, coordinates, popularity) for ``n_rows`` crimes."""
+    rng = np.random.default_rng(seed)
+    card = cardinalities(n_rows)
+
+    n_lsoa = card["lsoas"]
+    district = rng.integers(0, len(DISTRICTS), n_lsoa)
+    lsoa_names = np.array([
+        f"{DISTRICTS[d]} {i // 26 + 1:03d}{chr(65 + i % 26)}" for i, d in enumerate(district)
+    ], dtype=object)
+    lsoa_codes = np.array([f"E0{1000000 + i:07d}" for i in range(n_lsoa)], dtype=object)
+    lsoa_lon = CENTRE[0] + rng.normal(0, SPREAD[0] / 2, n_lsoa)
+    lsoa_lat = CENTRE[1] + rng.normal(0, SPREAD[1] / 2, n_lsoa)
+
+    n_loc = card["locations"]
+    loc_lsoa = rng.choice(n_lsoa, n_loc, p=_zipf_weights(n_lsoa, 0.6, rng))
+    # Street names repeat across LSOAs, as "On or near High Street" does in the real data.
+    n_streets = max(10, int(n_loc * 0.6))
+    street = rng.integers(0, n_streets, n_loc)
+    kind = street % len(STREET_KINDS)
+    names = np.array([f"On or near {STREET_KINDS[k]} {s // len(STREET_KINDS)}" for s, k in zip(street, kind)],
+                     dtype=object)
+    places = rng.random(n_loc) < 0.05
+    names[places] = [f"On or near {PLACES[i % len(PLACES)]}" for i in np.flatnonzero(places)]
+
+    return {
+        "lsoa_names": lsoa_names,
+        "lsoa_codes": lsoa_codes,
+        "location_names": names,
+        "location_lsoa": loc_lsoa,
+        # Coordinates are snapped to 1e-6° like the published data.
+        "location_lon": np.round(lsoa_lon[loc_lsoa] + rng.normal(0, 0.004, n_loc), 6),
+        "location_lat": np.round(lsoa_lat[loc_lsoa] + rng.normal(0, 0.003, n_loc), 6),
+        "location_weights": _zipf_weights(n_loc, 0.8, rng),
+    }
+
+
+def months(n_months=DEFAULT_MONTHS, first=FIRST_MONTH):
+    return [str(p) for p in pd.period_range(first, periods=n_months, freq="M")]
+
+
+# ------------------ ROWS ------------------ #
+def generate_month(month, n_rows, entities, rng):
+    """Raw police.uk rows for one month."""
+    loc = rng.choice(len(entities["location_names"]), n_rows, p=entities["location_weights"])
+    lsoa = entities["location_lsoa"][loc]
+    crime = rng.choice(len(CRIME_TYPES), n_rows, p=_weights(CRIME_TYPES))
+    outcome = rng.choice(len(OUTCOMES), n_rows, p=_weights(OUTCOMES))
+
+    crime_names = np.array([c for c, _ in CRIME_TYPES], dtype=object)[crime]
+    outcome_names = np.array([o for o, _ in OUTCOMES], dtype=object)[outcome]
+    # Anti-social behaviour has no crime id and no outcome in the published files.
+    asb = crime_names == "Anti-social behaviour"
+    outcome_names[asb | (rng.random(n_rows) < MISSING_OUTCOME_SHARE)] = None
+
+    lon = entities["location_lon"][loc].copy()
+    lat = entities["location_lat"][loc].copy()
+    missing = rng.random(n_rows) < MISSING_COORDINATE_SHARE
+    lon[missing] = np.nan
+    lat[missing] = np.nan
+
+    crime_id = pd.Series(rng.integers(0, 2**63, n_rows, dtype=np.int64)).map("{:016x}".format)
+    crime_id[asb] = None
+    return pd.DataFrame({
+        "Crime ID": crime_id,
+        "Month": month,
+        "Reported by": FORCE,
+        "Falls within": FORCE,
+        "Longitude": lon,
+        "Latitude": lat,
+        "Location": np.where(missing, "No location", entities["location_names"][loc]),
+        "LSOA code": np.where(missing, None, entities["lsoa_codes"][lsoa]),
+        "LSOA name": np.where(missing, None, entities["lsoa_names"][lsoa]),
+        "Crime type": crime_names,
+        "Last outcome category": outcome_names,
+        "Context": None,
+    })
+
+
+def police_strength(month_list, seed=DEFAULT_SEED):
+    """Monthly force strength table in the layout ``crime_etl.load_police_strength`` reads."""
+    rng = np.random.default_rng(seed + 1)
+    n = len(month_list)
+    return pd.DataFrame({
+        "Date": pd.to_datetime([m + "-01" for m in month_list]).strftime("%m/%d/%Y"),
+        "Police Officer Strength": 5000 + np.cumsum(rng.integers(-15, 25, n)),
+        "Police Staff Strength": 3000 + np.cumsum(rng.integers(-10, 15, n)),
+        "PCSO Strength": 300 + np.cumsum(rng.integers(-4, 5, n)),
+    })
+
+
+def write_dataset(out_dir, n_rows, seed=DEFAULT_SEED, n_months=DEFAULT_MONTHS, log=print):
+    """Write ``crimes/*.csv`` and ``police_strength.csv`` under ``out_dir``; returns a summary dict.
+
+    Reuses an existing dataset written with the same scale, seed and months;
+    any other dataset under ``out_dir`` is removed first, so no month files
+    from an earlier spec are left behind.
+    """
+    summary_path = os.path.join(out_dir, "synthetic.json")
+    spec = {"rows": n_rows, "seed": seed, "months": n_months}
+    try:
+        with open(summary_path, encoding="utf-8") as fh:
+            summary = json.load(fh)
+        if {k: summary.get(k) for k in spec} == spec:
+            return summary
+    except (OSError, ValueError):
+        pass
+
+    crime_dir = os.path.join(out_dir, "crimes")
+    # The summary marks a complete dataset: drop it until the new files are all written.
+    if os.path.exists(summary_path):
+        os.remove(summary_path)
+    shutil.rmtree(crime_dir, ignore_errors=True)
+    os.makedirs(crime_dir)
+    entities = build_entities(n_rows, seed)
+    month_list = months(n_months)
+    rng = np.random.default_rng(seed + 2)
+    per_month = np.full(n_months, n_rows // n_months)
+    per_month[: n_rows % n_months] += 1
+    for month, rows in zip(month_list, per_month):
+        path = os.path.join(crime_dir, f"{month}-west-yorkshire-street.csv")
+        generate_month(month, int(rows), entities, rng).to_csv(path, index=False)
+        log(f"{os.path.basename(path)}: {rows:,} rows")
+    police_strength(month_list, seed).to_csv(os.path.join(out_dir, "police_strength.csv"), index=False)
+
+    summary = {**spec, **cardinalities(n_rows), "crime_dir": crime_dir,
+               "police_csv": os.path.join(out_dir, "police_strength.csv")}
+    tmp = summary_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+    os.replace(tmp, summary_path)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write seeded synthetic police CSVs.")
+    parser.add_argument("scale", help="Crime rows, e.g. 100k, 2.2M, 20M")
+    parser.add_argument("--out", default="synthetic", help="Output folder")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS)
+    args = parser.parse_args(argv)
+    summary = write_dataset(args.out, parse_scale(args.scale), args.seed, args.months)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Streaming ingest of uploaded fact CSVs into content-addressed Arrow files.
+
+An upload is hashed block by block, then parsed ``CHUNK_ROWS`` rows at a
+time: each chunk is typed with the table's schema and appended to an Arrow
+IPC file named after the content hash under ``UPLOAD_DIR``. Categories grow
+from chunk to chunk (written as dictionary deltas), so only one chunk of
+parsed rows is held at a time instead of the whole frame plus a pickled
+cache copy.
+
+The same bytes uploaded again, by any session, are found by their hash and
+memory-mapped without parsing. The dashboard keeps the hash in
+``st.session_state`` so later reruns do not hash the upload again either.
+"""
+import hashlib
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+
+from columnar_cache import CACHE_DIR, CACHE_VERSION, HASH_BLOCK_SIZE, chunk_schema, read_arrow
+from fact_schema import TABLE_SCHEMAS, apply_schema, csv_dtypes
+
+# ------------------ SETTINGS ------------------ #
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+CHUNK_ROWS = 250_000
+# Dictionary deltas let later chunks add categories without rewriting earlier ones.
+_IPC_OPTIONS = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+# Seed category for a column whose first chunk is all null: the IPC file format
+# cannot grow an empty dictionary. read_csv reads empty fields as NaN, so no
+# parsed value is "".
+_SEED_CATEGORY = ""
+
+
+# ------------------ KEYS ------------------ #
+def upload_digest(file):
+    """Content hash of an uploaded file object, read block by block."""
+    h = hashlib.blake2b(digest_size=16)
+    file.seek(0)
+    for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+        h.update(block)
+    file.seek(0)
+    return h.hexdigest()
+
+
+def upload_path(digest, table, upload_dir=None):
+    return os.path.join(upload_dir or UPLOAD_DIR, f"{table}-{digest}-v{CACHE_VERSION}.arrow")
+
+
+# ------------------ WRITE ------------------ #
+def _extend_categories(chunk, seen):
+    # Recode each categorical onto the categories seen so far plus this chunk's new ones.
+    for col in chunk.columns:
+        if not isinstance(chunk[col].dtype, pd.CategoricalDtype):
+            continue
+        known = seen.get(col)
+        current = chunk[col].cat.categories
+        if known is None:
+            if not len(current):
+                current = pd.Index([_SEED_CATEGORY])
+                chunk[col] = chunk[col].cat.set_categories(current)
+            seen[col] = current
+            continue
+        new = current.difference(known)
+        if len(new):
+            known = seen[col] = known.append(new)
+        chunk[col] = chunk[col].cat.set_categories(known)
+    return chunk
+
+
+def write_chunks(chunks, data_path, table=None):
+    """Append typed DataFrame chunks to one Arrow IPC file (atomic replace); returns the row count.
+
+    ``table``'s categorical columns are stored as text whatever the first
+    chunk holds, so a column that starts out all-null still takes later values.
+    """
+    text_columns = [col for col, t in TABLE_SCHEMAS.get(table, {}).items() if t == "category"]
+    tmp = f"{data_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    seen, rows, writer = {}, 0, None
+    try:
+        with pa.OSFile(tmp, "wb") as sink:
+            for chunk in chunks:
+                chunk = _extend_categories(chunk, seen)
+                if writer is None:
+                    schema = chunk_schema(pa.Table.from_pandas(chunk, preserve_index=False), text_columns)
+                    writer = pa.ipc.new_file(sink, schema, options=_IPC_OPTIONS)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+            if writer is None:
+                raise ValueError("no rows to write")
+            writer.close()
+        os.replace(tmp, data_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return rows
+
+
+def parse_chunks(file, table, chunk_rows=CHUNK_ROWS):
+    """Typed chunks of a fact CSV (``year_month`` is derived once, on read)."""
+    for chunk in pd.read_csv(file, chunksize=chunk_rows, dtype=csv_dtypes(table)):
+        yield apply_schema(chunk, table).drop(columns="year_month")
+
+
+def ingest_upload(file, table, digest=None, upload_dir=None, chunk_rows=CHUNK_ROWS):
+    """Stream ``file`` into its content-addressed Arrow file unless it is there already; returns the digest."""
+    digest = digest or upload_digest(file)
+    data_path = upload_path(digest, table, upload_dir)
+    if not os.path.exists(data_path):
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        file.seek(0)
+        write_chunks(parse_chunks(file, table, chunk_rows), data_path, table)
+        file.seek(0)
+    return digest
+
+
+# ------------------ READ ------------------ #
+def read_upload(digest, table, upload_dir=None):
+    """Memory-map an ingested upload as a fact frame carrying ``attrs["fingerprint"]``."""
+    df = read_arrow(upload_path(digest, table, upload_dir))
+    # Chunks grew their categories in order of appearance; a single parse sorts them.
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            if _SEED_CATEGORY in df[col].cat.categories:
+                df[col] = df[col].cat.remove_categories(_SEED_CATEGORY)
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    # Re-casting settles nullable ints across chunks and derives year_month.
+    df = apply_schema(df, table)
+    df.attrs["fingerprint"] = f"{digest}-v{CACHE_VERSION}"
+    return df